@@ -13,6 +13,12 @@ logger = logging.getLogger("ses-daemon-bot")
 ADMIN_EMAIL = "page.cal@gmail.com"
 FROM_EMAIL = "admin@frflashy.com"
 
+# Cheap pre-filter for obvious auto-replies (checked before the LLM classifier)
+AUTO_REPLY_SENDER_RE = re.compile(r"^(no-?reply|do-?not-?reply)@", re.IGNORECASE)
+AUTO_REPLY_SUBJECT_RE = re.compile(
+    r"^(auto(matic)?[ -]?(reply|response)|out of (the )?office)", re.IGNORECASE
+)
+
 
 def is_bounce_notification(sender: str, subject: str) -> bool:
     """Check if an email is a bounce/delivery failure notification.
@@ -51,6 +57,22 @@ def is_bounce_notification(sender: str, subject: str) -> bool:
     return False
 
 
+def is_auto_reply(sender: str, subject: str) -> bool:
+    """Check if an email is obviously an auto-reply or from an unattended mailbox.
+
+    Args:
+        sender: Sender email address
+        subject: Email subject line
+
+    Returns:
+        True if the sender or subject matches a known auto-reply pattern
+    """
+    return bool(
+        AUTO_REPLY_SENDER_RE.match(sender or "")
+        or AUTO_REPLY_SUBJECT_RE.match(subject or "")
+    )
+
+
 def extract_bounced_email_from_raw(raw_content: bytes) -> Optional[str]:
     """Extract the bounced email address from raw DSN message content.
 
@@ -495,7 +517,7 @@ def handle_complaint(email, db, dry_run: bool = False, email_sender=None) -> Opt
     logger.info(f"Detected complaint notification: {email.subject}")
 
     # Extract the complainant email address
-    complainant_addr = extract_complaint_email(email.body, email.raw_content)
+    complainant_addr = extract_complaint_email(email.body, email.load_raw())
 
     if not complainant_addr:
         logger.warning("Could not extract complainant email address from notification")
@@ -696,8 +718,8 @@ def handle_bounce(email, db, dry_run: bool = False, email_sender=None) -> Option
 
     logger.info(f"Detected bounce notification: {email.subject}")
 
-    # Extract the bounced email address (pass raw_content for DSN parsing)
-    bounced_addr = extract_bounced_email(email.body, email.raw_content)
+    # Extract the bounced email address (pass the raw message for DSN parsing)
+    bounced_addr = extract_bounced_email(email.body, email.load_raw())
 
     if not bounced_addr:
         logger.warning("Could not extract bounced email address from notification")
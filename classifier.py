@@ -1,21 +1,51 @@
 """Intent classification using LLM."""
 
+import functools
+import hashlib
 import json
 import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import IntEnum
 from pathlib import Path
-from typing import Optional
-
-from openai import OpenAI
+from typing import TYPE_CHECKING, Optional
 
 from config import LLMConfig
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 logger = logging.getLogger("ses-daemon-bot")
 
 # Path to the prompt template
 PROMPT_TEMPLATE_PATH = Path(__file__).parent / "prompts" / "intent_classifier.txt"
 
+# Maximum concurrent LLM requests for classify_batch
+CLASSIFY_CONCURRENCY = 8
+
+# Fast path for the expected response shape: exactly 8 JSON booleans
+_FLAGS_RE = re.compile(r"\[\s*" + r"\s*,\s*".join([r"(true|false)"] * 8) + r"\s*\]")
+
+# Classifications remembered for near-identical emails (same sender, subject
+# and body up to case and whitespace), e.g. repeated auto-replies
+CLASSIFY_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=4)
+def _get_openai(api_key: str, base_url: Optional[str] = None) -> "OpenAI":
+    """Get a shared OpenAI client, so Classifiers reuse its connection pool."""
+    # Imported here: the openai package takes ~0.4s to import, which
+    # --help, --version and --test-creds never need
+    from openai import OpenAI
+
+    client_kwargs = {"api_key": api_key}
+    if base_url:
+        client_kwargs["base_url"] = base_url
+    return OpenAI(**client_kwargs)
+
 
 class Intent(IntEnum):
     """Email intent categories."""
@@ -96,14 +126,17 @@ class Classifier:
         self.config = config
         self.model = config.model
 
-        # Initialize OpenAI client
-        client_kwargs = {"api_key": config.api_key}
-        if config.base_url:
-            client_kwargs["base_url"] = config.base_url
-        self.client = OpenAI(**client_kwargs)
+        # Shared OpenAI client (one per API key and base URL)
+        self.client = _get_openai(config.api_key, config.base_url)
 
-        # Load prompt template
+        # Load prompt template; the static part before the email is a stable
+        # prefix, which the API's automatic prompt caching can reuse
         self.prompt_template = self._load_prompt_template()
+        self._prompt_prefix, _, self._prompt_suffix = self.prompt_template.partition("{EMAIL_TEXT}")
+
+        # LRU cache of valid classifications, keyed by normalized content
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def _load_prompt_template(self) -> str:
         """Load the prompt template from file."""
@@ -157,8 +190,21 @@ Return the JSON array now."""
         Returns:
             ClassificationResult with the determined intent.
         """
-        # Build the prompt
-        prompt = self.prompt_template.replace("{EMAIL_TEXT}", email_text)
+        return self._classify(email_text, max_retries)[0]
+
+    def _classify(self, email_text: str, max_retries: int = 2) -> tuple[ClassificationResult, bool]:
+        """Classify the intent of an email (see classify()).
+
+        Args:
+            email_text: The email content to classify.
+            max_retries: Maximum number of attempts on invalid response.
+
+        Returns:
+            Tuple of (ClassificationResult, whether it came from a valid
+            LLM response rather than an error or a defaulted response).
+        """
+        # Build the prompt (static instructions first, email last)
+        prompt = self._prompt_prefix + email_text + self._prompt_suffix
 
         for attempt in range(max_retries):
             try:
@@ -172,21 +218,26 @@ Return the JSON array now."""
 
                 raw_response = response.choices[0].message.content.strip()
                 logger.debug(f"LLM response (attempt {attempt + 1}): {raw_response}")
-
-                # Parse the response
-                result = self._parse_response(raw_response, retry_on_invalid=False)
-
-                # Check if response was valid (not defaulted to unknown due to invalid format)
-                if self._is_valid_response(raw_response):
-                    return result
+                details = getattr(getattr(response, "usage", None), "prompt_tokens_details", None)
+                if details is not None:
+                    logger.debug("Prompt tokens served from cache: %s", getattr(details, "cached_tokens", None))
+
+                # Parse and validate the response in one pass
+                intent_flags = self._parse_flags(raw_response)
+                if intent_flags is not None:
+                    return ClassificationResult(
+                        intent=Intent.from_index(intent_flags.index(True)),
+                        intent_flags=intent_flags,
+                        raw_response=raw_response,
+                    ), True
 
                 # Invalid response, retry if we have attempts left
                 if attempt < max_retries - 1:
                     logger.warning(f"Invalid LLM response, retrying (attempt {attempt + 2}/{max_retries})")
                     continue
 
-                # Last attempt, return whatever we got
-                return result
+                # Last attempt, return whatever we got (defaults to unknown)
+                return self._parse_response(raw_response, retry_on_invalid=False), False
 
             except Exception as e:
                 logger.error(f"Classification error: {e}")
@@ -198,14 +249,39 @@ Return the JSON array now."""
                     intent=Intent.UNKNOWN,
                     intent_flags=[False, False, True, False, False, False, False, False],
                     raw_response=str(e),
-                )
+                ), False
 
         # Should not reach here, but just in case
         return ClassificationResult(
             intent=Intent.UNKNOWN,
             intent_flags=[False, False, True, False, False, False, False, False],
             raw_response="max retries exceeded",
-        )
+        ), False
+
+    @staticmethod
+    def _parse_flags(raw_response: str) -> Optional[list[bool]]:
+        """Parse an LLM response into intent flags if it is valid.
+
+        Args:
+            raw_response: The raw LLM response string.
+
+        Returns:
+            List of 8 bools with exactly one True, or None if invalid.
+        """
+        match = _FLAGS_RE.fullmatch(raw_response or "")
+        if match:
+            intent_flags = [group == "true" for group in match.groups()]
+            return intent_flags if intent_flags.count(True) == 1 else None
+
+        # Anything else (e.g. 0/1 values) goes through the JSON parser
+        try:
+            intent_flags = json.loads(raw_response)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(intent_flags, list) or len(intent_flags) != 8:
+            return None
+        intent_flags = [bool(x) for x in intent_flags]
+        return intent_flags if intent_flags.count(True) == 1 else None
 
     def _is_valid_response(self, raw_response: str) -> bool:
         """Check if an LLM response is valid (exactly 1 true value).
@@ -216,72 +292,58 @@ Return the JSON array now."""
         Returns:
             True if valid, False otherwise.
         """
-        try:
-            intent_flags = json.loads(raw_response)
-            if not isinstance(intent_flags, list) or len(intent_flags) != 8:
-                return False
-            true_count = sum(bool(x) for x in intent_flags)
-            return true_count == 1
-        except Exception:
-            return False
+        return self._parse_flags(raw_response) is not None
 
     def _parse_response(self, raw_response: str, retry_on_invalid: bool = True) -> ClassificationResult:
         """Parse the LLM response into a ClassificationResult.
 
+        Invalid responses (see _parse_flags()) default to the unknown intent.
+
         Args:
             raw_response: The raw LLM response string.
 
         Returns:
             Parsed ClassificationResult.
         """
-        try:
-            # Parse JSON array
-            intent_flags = json.loads(raw_response)
+        intent_flags = self._parse_flags(raw_response)
+        if intent_flags is None:
+            logger.warning(f"Invalid LLM response, defaulting to unknown: {raw_response!r}")
+            intent_flags = [False, False, True, False, False, False, False, False]
 
-            # Validate format
-            if not isinstance(intent_flags, list) or len(intent_flags) != 8:
-                raise ValueError(f"Invalid response format: expected list of 8, got {intent_flags}")
-
-            # Convert to bools
-            intent_flags = [bool(x) for x in intent_flags]
-
-            # Find the true index
-            true_count = sum(intent_flags)
-            if true_count != 1:
-                logger.warning(f"Expected exactly 1 true value, got {true_count}")
-                # Default to unknown if invalid
-                intent_flags = [False, False, True, False, False, False, False, False]
-
-            # Get the intent
-            intent_index = intent_flags.index(True)
-            intent = Intent.from_index(intent_index)
-
-            return ClassificationResult(
-                intent=intent,
-                intent_flags=intent_flags,
-                raw_response=raw_response,
-            )
-
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse LLM response as JSON: {e}")
-            return ClassificationResult(
-                intent=Intent.UNKNOWN,
-                intent_flags=[False, False, True, False, False, False, False, False],
-                raw_response=raw_response,
-            )
-        except Exception as e:
-            logger.warning(f"Error parsing classification response: {e}")
-            return ClassificationResult(
-                intent=Intent.UNKNOWN,
-                intent_flags=[False, False, True, False, False, False, False, False],
-                raw_response=raw_response,
-            )
+        return ClassificationResult(
+            intent=Intent.from_index(intent_flags.index(True)),
+            intent_flags=intent_flags,
+            raw_response=raw_response,
+        )
+
+    def classify_batch(
+        self, items: list[tuple[str, str, str]], max_workers: int = CLASSIFY_CONCURRENCY
+    ) -> list[ClassificationResult]:
+        """Classify several emails with concurrent LLM requests.
+
+        Args:
+            items: List of (subject, body, sender) tuples.
+            max_workers: Maximum number of requests in flight.
+
+        Returns:
+            List of ClassificationResults in the same order as items.
+        """
+        if not items:
+            return []
+        if len(items) == 1:
+            return [self.classify_with_context(*items[0])]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(lambda item: self.classify_with_context(*item), items))
 
     def classify_with_context(
         self, subject: str, body: str, sender: str = ""
     ) -> ClassificationResult:
         """Classify email with structured context.
 
+        Near-identical emails (same sender, subject and body, ignoring case
+        and whitespace) reuse an earlier valid classification.
+
         Args:
             subject: Email subject line.
             body: Email body text.
@@ -290,6 +352,14 @@ Return the JSON array now."""
         Returns:
             ClassificationResult with the determined intent.
         """
+        key = self._cache_key(subject, body, sender)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                logger.debug("Classification cache hit")
+                return cached
+
         # Build structured email text
         parts = []
         if sender:
@@ -300,4 +370,19 @@ Return the JSON array now."""
             parts.append(f"\n{body}")
 
         email_text = "\n".join(parts)
-        return self.classify(email_text)
+        result, valid = self._classify(email_text)
+
+        # Errors and defaulted responses are not cached, so they get retried
+        if valid:
+            with self._cache_lock:
+                self._cache[key] = result
+                if len(self._cache) > CLASSIFY_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        return result
+
+    @staticmethod
+    def _cache_key(subject: str, body: str, sender: str = "") -> str:
+        """Hash sender, subject and body, normalized for case and whitespace."""
+        text = "\0".join(" ".join((part or "").split()).casefold() for part in (sender, subject, body))
+        return hashlib.sha256(text.encode()).hexdigest()
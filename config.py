@@ -15,21 +15,34 @@ from dotenv import load_dotenv
 DEFAULT_ENV_FILE = Path("/home/ubuntu/.env")
 
 
+# Field metadata used by credential checks (main.check_credentials):
+#   credential: environment variable name reported for the field
+#   level:      "error" (required), "warn" (has a default) or "optional"
+#   show:       report the configured value instead of "configured"
+#   fallback:   (label, field names) that may stand in for a missing value
+
+
 @dataclass
 class AWSConfig:
     """AWS credentials and settings."""
 
-    access_key_id: str = ""
-    secret_access_key: str = ""
-    region: str = "us-east-1"
-    ses_bucket: str = ""
+    access_key_id: str = field(default="", metadata={"credential": "AWS_ACCESS_KEY"})
+    secret_access_key: str = field(default="", metadata={"credential": "AWS_SECRET_ACCESS_KEY"})
+    region: str = field(
+        default="us-east-1",
+        metadata={"credential": "AWS_REGION", "level": "warn", "show": True},
+    )
+    ses_bucket: str = field(default="", metadata={"credential": "SES_BUCKET", "show": True})
 
 
 @dataclass
 class DatabaseConfig:
     """PostgreSQL database settings."""
 
-    url: str = ""
+    url: str = field(
+        default="",
+        metadata={"credential": "NEON_DATABASE_URL", "fallback": ("DB_HOST/DB_USER", ("host", "user"))},
+    )
     # Parsed components (optional, derived from url)
     host: str = "localhost"
     port: int = 5432
@@ -42,8 +55,11 @@ class DatabaseConfig:
 class LLMConfig:
     """LLM/OpenAI settings for intent classification."""
 
-    api_key: str = ""
-    model: str = "gpt-4"
+    api_key: str = field(default="", metadata={"credential": "OPENAI_API_KEY"})
+    model: str = field(
+        default="gpt-4",
+        metadata={"credential": "LLM_MODEL", "level": "optional", "show": True},
+    )
     base_url: Optional[str] = None  # For custom endpoints
 
 
@@ -4,20 +4,40 @@ Handles PostgreSQL database connections and operations for storing
 and retrieving processed emails.
 """
 
+import functools
+import itertools
 import json
 import logging
+import re
+import threading
+import time
+import weakref
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 from config import DatabaseConfig
 
 logger = logging.getLogger("ses-daemon-bot")
 
+# Connection pool settings. psycopg2 itself never uses server-side prepared
+# statements, so this is safe behind Neon's pgbouncer (-pooler) endpoint;
+# PREPARED_QUERIES below are only prepared on direct connections.
+# POOL_MIN_SIZE connections are opened up front; once opened, up to
+# POOL_MAX_SIZE are kept, and checkouts beyond that wait for a free one.
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 5
+
+# Connections idle for longer than this (seconds) are checked with a
+# SELECT 1 before reuse, since Neon drops them when compute suspends
+POOL_MAX_IDLE = 30.0
+
 # SQL statements
 CREATE_EMAILS_TABLE = """
 CREATE TABLE IF NOT EXISTS ses_emails (
@@ -38,6 +58,7 @@ CREATE TABLE IF NOT EXISTS ses_emails (
 );
 
 CREATE INDEX IF NOT EXISTS idx_ses_emails_message_id ON ses_emails(message_id);
+CREATE INDEX IF NOT EXISTS idx_ses_emails_s3_key ON ses_emails(s3_key);
 CREATE INDEX IF NOT EXISTS idx_ses_emails_sender ON ses_emails(sender);
 CREATE INDEX IF NOT EXISTS idx_ses_emails_intent_label ON ses_emails(intent_label);
 CREATE INDEX IF NOT EXISTS idx_ses_emails_status ON ses_emails(status);
@@ -98,6 +119,57 @@ EMAIL_EXISTS = """
 SELECT EXISTS(SELECT 1 FROM ses_emails WHERE message_id = %s);
 """
 
+EMAILS_EXISTING = """
+SELECT message_id FROM ses_emails WHERE message_id = ANY(%s);
+"""
+
+S3_KEYS_EXISTING = """
+SELECT DISTINCT s3_key FROM ses_emails WHERE s3_key = ANY(%s);
+"""
+
+INSERT_EMAILS = """
+INSERT INTO ses_emails (
+    message_id, s3_key, sender, sender_name, recipient, subject, body,
+    received_at, intent_flags, intent_label, handler_result, status
+) VALUES %s
+ON CONFLICT (message_id) DO UPDATE SET
+    intent_flags = EXCLUDED.intent_flags,
+    intent_label = EXCLUDED.intent_label,
+    handler_result = EXCLUDED.handler_result,
+    status = EXCLUDED.status,
+    processed_at = NOW()
+RETURNING id;
+"""
+
+INSERT_EMAILS_TEMPLATE = """(
+    %(message_id)s, %(s3_key)s, %(sender)s, %(sender_name)s, %(recipient)s,
+    %(subject)s, %(body)s, %(received_at)s, %(intent_flags)s, %(intent_label)s,
+    %(handler_result)s, %(status)s
+)"""
+
+# Hot read paths run as per-connection prepared statements:
+# statement name -> (SQL, parameter types)
+PREPARED_QUERIES = {
+    "ses_email_by_message_id": (SELECT_EMAIL_BY_MESSAGE_ID, ("text",)),
+    "ses_email_exists": (EMAIL_EXISTS, ("text",)),
+    "ses_emails_by_intent": (SELECT_EMAILS_BY_INTENT, ("text", "integer")),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _prepare_sql(name: str) -> str:
+    """Build the PREPARE statement for a PREPARED_QUERIES entry."""
+    sql, types = PREPARED_QUERIES[name]
+    counter = itertools.count(1)
+    body = re.sub(r"%s", lambda _: f"${next(counter)}", sql.strip().rstrip(";"))
+    return f"PREPARE {name} ({', '.join(types)}) AS {body}"
+
+
+@functools.lru_cache(maxsize=32)
+def _flags_json(intent_flags: tuple[bool, ...]) -> str:
+    """Serialize intent flags; only a handful of distinct values ever occur."""
+    return json.dumps(intent_flags)
+
 
 @dataclass
 class EmailRecord:
@@ -121,6 +193,9 @@ class EmailRecord:
     @classmethod
     def from_row(cls, row: dict) -> "EmailRecord":
         """Create EmailRecord from database row."""
+        # SELECT * rows carry exactly the record's fields
+        if row.keys() == EMAIL_RECORD_FIELDS:
+            return cls(**row)
         return cls(
             id=row["id"],
             message_id=row["message_id"],
@@ -139,6 +214,36 @@ class EmailRecord:
         )
 
 
+EMAIL_RECORD_FIELDS = frozenset(f.name for f in fields(EmailRecord))
+
+
+class KeepIdleConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that keeps every healthy returned connection.
+
+    psycopg2's pool closes a returned connection once ``minconn`` are
+    idle, so a pool that opens one connection up front would keep only
+    one; this one keeps up to ``maxconn``.
+    """
+
+    def _putconn(self, conn, key=None, close=False):
+        """Put away a connection (called by putconn() under the pool lock)."""
+        status = conn.info.transaction_status if not conn.closed else None
+        if self.closed or close or status in (None, TRANSACTION_STATUS_UNKNOWN):
+            super()._putconn(conn, key, close=True)
+            return
+
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise PoolError("trying to put unkeyed connection")
+
+        if status != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        self._pool.append(conn)
+        del self._used[key]
+        del self._rused[id(conn)]
+
+
 class Database:
     """PostgreSQL database client."""
 
@@ -150,22 +255,81 @@ class Database:
         """
         self.config = config
         self.connection_url = config.url
-        self._connection = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Bounds checkouts to the pool size, so callers block instead of
+        # getconn() raising PoolError when every connection is in use
+        self._checkout = threading.BoundedSemaphore(POOL_MAX_SIZE)
+        # Connection -> time it was last returned; weak keys, as the pool
+        # drops closed connections
+        self._last_used = weakref.WeakKeyDictionary()
+        # pgbouncer in transaction mode cannot keep SQL-level prepared statements
+        self.use_prepared = "-pooler" not in self.connection_url
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def _get_pool(self) -> KeepIdleConnectionPool:
+        """Create the connection pool on first use."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = KeepIdleConnectionPool(POOL_MIN_SIZE, POOL_MAX_SIZE, self.connection_url)
+            return self._pool
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        """Check a pooled connection with a SELECT 1 round trip."""
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1;")
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
 
     @contextmanager
     def get_connection(self):
-        """Get a database connection (context manager).
+        """Get a pooled database connection (context manager).
+
+        Blocks while all POOL_MAX_SIZE connections are in use. Connections
+        idle for longer than POOL_MAX_IDLE seconds are checked before use
+        and replaced if dead (Neon drops idle connections when compute
+        suspends), and connections that fail with a connection-level error
+        are discarded.
 
         Yields:
             psycopg2 connection object.
         """
-        conn = None
-        try:
-            conn = psycopg2.connect(self.connection_url)
-            yield conn
-        finally:
-            if conn:
-                conn.close()
+        pool = self._get_pool()
+        with self._checkout:
+            conn = pool.getconn()
+            last_used = self._last_used.get(conn)
+            if last_used is not None and time.monotonic() - last_used > POOL_MAX_IDLE and not self._is_alive(conn):
+                self._last_used.pop(conn, None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+
+            discard = False
+            try:
+                yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                discard = True
+                raise
+            finally:
+                if discard:
+                    self._last_used.pop(conn, None)
+                else:
+                    self._last_used[conn] = time.monotonic()
+                pool.putconn(conn, close=discard)
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
 
     @contextmanager
     def get_cursor(self, commit: bool = True):
@@ -189,6 +353,24 @@ class Database:
             finally:
                 cursor.close()
 
+    def _execute_prepared(self, cursor, name: str, params: tuple):
+        """Execute a PREPARED_QUERIES statement, preparing it on first use.
+
+        Args:
+            cursor: Cursor from get_cursor().
+            name: Statement name in PREPARED_QUERIES.
+            params: Query parameters.
+        """
+        if not self.use_prepared:
+            cursor.execute(PREPARED_QUERIES[name][0], params)
+            return
+
+        prepared = self._prepared.setdefault(cursor.connection, set())
+        if name not in prepared:
+            cursor.execute(_prepare_sql(name))
+            prepared.add(name)
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params)
+
     def initialize(self) -> bool:
         """Initialize the database schema.
 
@@ -211,7 +393,7 @@ class Database:
         message_id: str,
         s3_key: str,
         sender: str,
-        intent_flags: list[bool],
+        intent_flags: Sequence[bool],
         intent_label: str,
         sender_name: Optional[str] = None,
         recipient: Optional[str] = None,
@@ -227,7 +409,7 @@ class Database:
             message_id: Unique message identifier.
             s3_key: S3 object key.
             sender: Sender email address.
-            intent_flags: Classification result as list of bools.
+            intent_flags: Classification result as a sequence of bools.
             intent_label: Intent label string.
             sender_name: Optional sender display name.
             recipient: Optional recipient address.
@@ -253,7 +435,7 @@ class Database:
                         "subject": subject,
                         "body": body,
                         "received_at": received_at,
-                        "intent_flags": json.dumps(intent_flags),
+                        "intent_flags": _flags_json(tuple(intent_flags)),
                         "intent_label": intent_label,
                         "handler_result": json.dumps(handler_result) if handler_result else None,
                         "status": status,
@@ -265,6 +447,49 @@ class Database:
             logger.error(f"Failed to save email {message_id}: {e}")
             return None
 
+    def save_email_many(self, records: list[dict]) -> list[int]:
+        """Save several processed emails in a single round trip.
+
+        Args:
+            records: Dicts with the same keys as save_email() arguments.
+                Missing optional keys default as in save_email().
+
+        Returns:
+            List of inserted/updated record IDs, or an empty list on failure.
+        """
+        if not records:
+            return []
+
+        try:
+            # ON CONFLICT cannot touch the same row twice in one statement,
+            # so keep only the last record for each message_id
+            rows = {}
+            for record in records:
+                rows[record["message_id"]] = {
+                    "message_id": record["message_id"],
+                    "s3_key": record["s3_key"],
+                    "sender": record["sender"],
+                    "sender_name": record.get("sender_name"),
+                    "recipient": record.get("recipient"),
+                    "subject": record.get("subject"),
+                    "body": record.get("body"),
+                    "received_at": record.get("received_at"),
+                    "intent_flags": _flags_json(tuple(record["intent_flags"])),
+                    "intent_label": record["intent_label"],
+                    "handler_result": json.dumps(record["handler_result"]) if record.get("handler_result") else None,
+                    "status": record.get("status", "processed"),
+                }
+
+            with self.get_cursor() as cursor:
+                result = execute_values(
+                    cursor, INSERT_EMAILS, list(rows.values()),
+                    template=INSERT_EMAILS_TEMPLATE, fetch=True,
+                )
+                return [row["id"] for row in result]
+        except Exception as e:
+            logger.error(f"Failed to save {len(records)} emails: {e}")
+            return []
+
     def get_email_by_message_id(self, message_id: str) -> Optional[EmailRecord]:
         """Get an email by its message ID.
 
@@ -276,7 +501,7 @@ class Database:
         """
         try:
             with self.get_cursor(commit=False) as cursor:
-                cursor.execute(SELECT_EMAIL_BY_MESSAGE_ID, (message_id,))
+                self._execute_prepared(cursor, "ses_email_by_message_id", (message_id,))
                 row = cursor.fetchone()
                 return EmailRecord.from_row(row) if row else None
         except Exception as e:
@@ -312,13 +537,56 @@ class Database:
         """
         try:
             with self.get_cursor(commit=False) as cursor:
-                cursor.execute(EMAIL_EXISTS, (message_id,))
+                self._execute_prepared(cursor, "ses_email_exists", (message_id,))
                 result = cursor.fetchone()
                 return result["exists"] if result else False
         except Exception as e:
             logger.error(f"Failed to check email existence: {e}")
             return False
 
+    def email_exists_many(self, message_ids: list[str]) -> set[str]:
+        """Check which of several emails have already been processed.
+
+        Args:
+            message_ids: The message IDs to check.
+
+        Returns:
+            Set of the given message IDs that exist in the database.
+        """
+        if not message_ids:
+            return set()
+
+        try:
+            with self.get_cursor(commit=False) as cursor:
+                cursor.execute(EMAILS_EXISTING, (list(message_ids),))
+                return {row["message_id"] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to check email existence: {e}")
+            return set()
+
+    def s3_keys_existing(self, s3_keys: list[str]) -> set[str]:
+        """Check which S3 objects have already been processed.
+
+        Lets the caller skip downloading and parsing objects that were
+        saved but not moved out of incoming/ (e.g. after a crash).
+
+        Args:
+            s3_keys: The S3 object keys to check.
+
+        Returns:
+            Set of the given S3 keys that exist in the database.
+        """
+        if not s3_keys:
+            return set()
+
+        try:
+            with self.get_cursor(commit=False) as cursor:
+                cursor.execute(S3_KEYS_EXISTING, (list(s3_keys),))
+                return {row["s3_key"] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to check S3 key existence: {e}")
+            return set()
+
     def get_emails_by_intent(
         self, intent_label: str, limit: int = 100
     ) -> list[EmailRecord]:
@@ -333,7 +601,7 @@ class Database:
         """
         try:
             with self.get_cursor(commit=False) as cursor:
-                cursor.execute(SELECT_EMAILS_BY_INTENT, (intent_label, limit))
+                self._execute_prepared(cursor, "ses_emails_by_intent", (intent_label, limit))
                 return [EmailRecord.from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Failed to get emails by intent {intent_label}: {e}")
@@ -8,6 +8,7 @@ import boto3
 from botocore.exceptions import ClientError
 
 from config import AWSConfig
+from ses_client import BOTO_CLIENT_CONFIG
 
 logger = logging.getLogger("ses-daemon-bot")
 
@@ -80,6 +81,7 @@ class EmailSender:
             aws_access_key_id=config.access_key_id,
             aws_secret_access_key=config.secret_access_key,
             region_name=config.region,
+            config=BOTO_CLIENT_CONFIG,
         )
 
     def send_email(
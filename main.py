@@ -3,18 +3,26 @@
 
 import argparse
 import atexit
+import dataclasses
+import functools
 import logging
+import logging.handlers
 import os
+import queue
+import select
 import signal
+import socket
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from config import load_config
+from config import Config, load_config
 from ses_client import SESClient
-from classifier import Classifier
+from classifier import ClassificationResult, Classifier, Intent
 from db import Database
-from blacklist import handle_bounce, handle_complaint, handle_auto_reply, handle_dmarc_report
+from blacklist import handle_bounce, handle_complaint, handle_auto_reply, handle_dmarc_report, is_auto_reply, is_bounce_notification, is_complaint_notification, is_dmarc_report
 from workmail import WorkMailClient
 from handlers import EmailSender, handle_send_info, handle_unknown, handle_speak_to_human, handle_email_to_human, handle_create_account, handle_unsubscribe
 
@@ -22,6 +30,28 @@ __version__ = "0.1.4"
 
 logger = logging.getLogger("ses-daemon-bot")
 
+# Separator line for console output
+_SEPARATOR = "-" * 40
+
+# Emails classified together per batch in process_emails
+CLASSIFY_BATCH_SIZE = 16
+
+# Emails handled concurrently within a batch; each worker holds at most one
+# database connection at a time (checkouts beyond db.POOL_MAX_SIZE wait)
+HANDLER_CONCURRENCY = 4
+
+# Intent flags stored for notifications, which skip intent classification
+NO_INTENT_FLAGS = (False,) * 8
+
+# Intent flags for emails caught by the auto-reply pre-filter
+AUTO_REPLY_INTENT_FLAGS = tuple(intent == Intent.SPAM_OR_AUTO_REPLY for intent in Intent)
+
+# Adaptive polling (seconds): fast polls after mail arrives, backoff when idle
+ACTIVE_POLL_INTERVAL = 2
+ACTIVE_POLL_CYCLES = 5
+MAX_POLL_INTERVAL = 300
+POLL_BACKOFF = 1.5
+
 
 def setup_logging(verbose=False, log_file=None):
     """Configure logging."""
@@ -31,7 +61,13 @@ def setup_logging(verbose=False, log_file=None):
     handlers = []
 
     if log_file:
-        handlers.append(logging.FileHandler(log_file))
+        # Writes happen on a listener thread so log calls don't block on
+        # file I/O; only set up after daemonizing, as fork drops threads
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, logging.FileHandler(log_file))
+        listener.start()
+        atexit.register(listener.stop)
+        handlers.append(logging.handlers.QueueHandler(log_queue))
     else:
         handlers.append(logging.StreamHandler())
 
@@ -39,13 +75,19 @@ def setup_logging(verbose=False, log_file=None):
 
 
 def write_pid_file(pid_file):
-    """Write current PID to file."""
+    """Write current PID to file.
+
+    Returns:
+        Callable that removes the PID file; the caller runs it on shutdown.
+    """
     pid = os.getpid()
-    with open(pid_file, "w") as f:
-        f.write(str(pid))
+    fd = os.open(pid_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, str(pid).encode())
+    finally:
+        os.close(fd)
     logger.info(f"PID {pid} written to {pid_file}")
 
-    # Register cleanup on exit
     def remove_pid_file():
         try:
             os.remove(pid_file)
@@ -53,16 +95,90 @@ def write_pid_file(pid_file):
         except OSError:
             pass
 
-    atexit.register(remove_pid_file)
+    return remove_pid_file
+
+
+def sd_notify(message):
+    """Send a notification to the service manager (systemd Type=notify).
+
+    No-op when NOTIFY_SOCKET is not set.
+
+    Returns:
+        True if the message was sent, False otherwise
+    """
+    addr = os.environ.get("NOTIFY_SOCKET")
+    if not addr:
+        return False
+
+    # Abstract namespace sockets are given with a leading '@'
+    if addr.startswith("@"):
+        addr = "\0" + addr[1:]
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(addr)
+            sock.sendall(message.encode() if isinstance(message, str) else message)
+        return True
+    except OSError as e:
+        logger.warning(f"sd_notify failed: {e}")
+        return False
+
+
+# Hidden flag passed to the re-executed daemon process
+_DAEMONIZED_FLAG = "--_already-daemonized"
+
+
+def _spawn_detached():
+    """Re-execute this program in a new session with stdio on /dev/null.
+
+    A single posix_spawn with setsid replaces the fork/setsid/fork sequence
+    and avoids copying the parent's address space.
+    """
+    file_actions = [
+        (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+        (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY | os.O_APPEND, 0),
+        (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY | os.O_APPEND, 0),
+    ]
+    argv = [sys.executable, os.path.abspath(sys.argv[0]), *sys.argv[1:], _DAEMONIZED_FLAG]
+    os.posix_spawn(sys.executable, argv, os.environ, file_actions=file_actions, setsid=True)
+
+
+def daemonize(already_detached=False):
+    """Detach process and run as a daemon.
 
+    Args:
+        already_detached: True in the process started by _spawn_detached();
+            only the working directory and umask still need resetting.
+    """
+    # Under a notify-aware service manager the process must stay in the
+    # foreground; the manager already handles detaching and log capture.
+    if "NOTIFY_SOCKET" in os.environ:
+        logger.info("Detected service manager; skipping double-fork")
+        return
 
-def daemonize():
-    """Detach process and run as a daemon."""
-    # First fork
+    if already_detached:
+        os.chdir("/")
+        os.umask(0)
+        return
+
+    # Flush once up front; the exiting parents below skip stdio flushing
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    if sys.platform == "linux" and hasattr(os, "posix_spawn"):
+        try:
+            _spawn_detached()
+        except (NotImplementedError, OSError) as e:
+            logger.debug(f"posix_spawn unavailable, falling back to fork: {e}")
+        else:
+            sys.exit(0)
+
+    # First fork (the exiting parents use os._exit() to skip atexit
+    # handlers and a second stdio flush)
     pid = os.fork()
     if pid > 0:
         # Parent exits
-        sys.exit(0)
+        os._exit(0)
 
     # Decouple from parent environment
     os.chdir("/")
@@ -73,38 +189,43 @@ def daemonize():
     pid = os.fork()
     if pid > 0:
         # First child exits
-        sys.exit(0)
+        os._exit(0)
 
     # Redirect standard file descriptors
-    sys.stdout.flush()
-    sys.stderr.flush()
-    with open("/dev/null", "rb", 0) as f:
-        os.dup2(f.fileno(), sys.stdin.fileno())
-    with open("/dev/null", "ab", 0) as f:
-        os.dup2(f.fileno(), sys.stdout.fileno())
-    with open("/dev/null", "ab", 0) as f:
-        os.dup2(f.fileno(), sys.stderr.fileno())
+    devnull_r = os.open(os.devnull, os.O_RDONLY)
+    devnull_w = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull_r, sys.stdin.fileno())
+    os.dup2(devnull_w, sys.stdout.fileno())
+    os.dup2(devnull_w, sys.stderr.fileno())
+    os.close(devnull_r)
+    os.close(devnull_w)
 
 
-def parse_args():
-    """Parse command line arguments."""
-    parser = argparse.ArgumentParser(
-        prog="ses-daemon-bot",
-        description="AWS SES mail processor for FrFlashy.com",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+_EPILOG = """
 Examples:
   %(prog)s                      Run in foreground
   %(prog)s --daemon             Run as background daemon
   %(prog)s --dry-run            Test mode, no actual processing
   %(prog)s --once               Process one batch and exit
   %(prog)s -v --log-file bot.log  Verbose logging to file
-        """,
+        """
+
+_VERSION_STR = f"%(prog)s {__version__}"
+
+
+@functools.lru_cache(maxsize=1)
+def _get_parser():
+    """Build the argument parser (once per process)."""
+    parser = argparse.ArgumentParser(
+        prog="ses-daemon-bot",
+        description="AWS SES mail processor for FrFlashy.com",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG,
     )
     parser.add_argument(
         "--version",
         action="version",
-        version=f"%(prog)s {__version__}",
+        version=_VERSION_STR,
     )
     parser.add_argument(
         "-v",
@@ -146,9 +267,9 @@ Examples:
     parser.add_argument(
         "--interval",
         type=int,
-        default=60,
+        default=None,
         metavar="SECS",
-        help="Polling interval in seconds (default: 60)",
+        help="Polling interval in seconds (default: POLL_INTERVAL or 60)",
     )
     parser.add_argument(
         "--test-creds",
@@ -160,7 +281,52 @@ Examples:
         action="store_true",
         help="Read and display emails from S3 bucket (non-destructive), then exit",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        _DAEMONIZED_FLAG,
+        action="store_true",
+        dest="already_daemonized",
+        help=argparse.SUPPRESS,
+    )
+    return parser
+
+
+def parse_args(argv=None):
+    """Parse command line arguments (sys.argv[1:] if argv is None)."""
+    return _get_parser().parse_args(argv)
+
+
+def _resolve(cli_value, config_value, default=None):
+    """Pick the command line value, then the config value, then the default."""
+    if cli_value is not None:
+        return cli_value
+    if config_value is not None:
+        return config_value
+    return default
+
+
+def _build_credential_spec():
+    """Collect credential fields declared in the config dataclasses.
+
+    Returns:
+        Tuple of (section, field, env_name, level, show, fallback) entries
+    """
+    spec = []
+    for section in dataclasses.fields(Config):
+        for f in dataclasses.fields(section.default_factory):
+            env_name = f.metadata.get("credential")
+            if env_name:
+                spec.append((
+                    section.name,
+                    f.name,
+                    env_name,
+                    f.metadata.get("level", "error"),
+                    f.metadata.get("show", False),
+                    f.metadata.get("fallback"),
+                ))
+    return tuple(spec)
+
+
+_CREDENTIAL_SPEC = _build_credential_spec()
 
 
 def check_credentials(config):
@@ -173,43 +339,18 @@ def check_credentials(config):
     warnings = []
     success = []
 
-    # AWS credentials
-    if config.aws.access_key_id:
-        success.append("AWS_ACCESS_KEY: configured")
-    else:
-        errors.append("AWS_ACCESS_KEY: MISSING")
-
-    if config.aws.secret_access_key:
-        success.append("AWS_SECRET_ACCESS_KEY: configured")
-    else:
-        errors.append("AWS_SECRET_ACCESS_KEY: MISSING")
-
-    if config.aws.region:
-        success.append(f"AWS_REGION: {config.aws.region}")
-    else:
-        warnings.append("AWS_REGION: not set (will use default)")
-
-    if config.aws.ses_bucket:
-        success.append(f"SES_BUCKET: {config.aws.ses_bucket}")
-    else:
-        errors.append("SES_BUCKET: MISSING")
-
-    # Database
-    if config.database.url:
-        success.append("NEON_DATABASE_URL: configured")
-    elif config.database.host and config.database.user:
-        success.append("DB_HOST/DB_USER: configured")
-    else:
-        errors.append("NEON_DATABASE_URL or DB_HOST/DB_USER: MISSING")
-
-    # LLM / OpenAI
-    if config.llm.api_key:
-        success.append("OPENAI_API_KEY: configured")
-    else:
-        errors.append("OPENAI_API_KEY: MISSING")
-
-    if config.llm.model:
-        success.append(f"LLM_MODEL: {config.llm.model}")
+    for section, name, env_name, level, show, fallback in _CREDENTIAL_SPEC:
+        settings = getattr(config, section)
+        value = getattr(settings, name)
+        if value:
+            success.append(f"{env_name}: {value if show else 'configured'}")
+        elif fallback and all(getattr(settings, attr) for attr in fallback[1]):
+            success.append(f"{fallback[0]}: configured")
+        elif level == "error":
+            label = f"{env_name} or {fallback[0]}" if fallback else env_name
+            errors.append(f"{label}: MISSING")
+        elif level == "warn":
+            warnings.append(f"{env_name}: not set (will use default)")
 
     return errors, warnings, success
 
@@ -219,8 +360,6 @@ def test_ses_connection(config):
 
     Non-destructive: only reads emails, does not move or delete them.
     """
-    from ses_client import SESClient
-
     print(f"Connecting to S3 bucket: {config.aws.ses_bucket}")
     print(f"Region: {config.aws.region}")
     print("=" * 60)
@@ -236,20 +375,17 @@ def test_ses_connection(config):
         print(f"  Failed:    {counts['failed']}")
         print("=" * 60)
 
-        # List and display pending emails
-        pending_keys = list(client.list_pending_emails())
-
-        if not pending_keys:
-            print("No pending emails in inbox.")
-            return
-
-        print(f"\nPending emails ({len(pending_keys)}):\n")
-
-        for i, s3_key in enumerate(pending_keys, 1):
-            print(f"--- Email {i}/{len(pending_keys)} ---")
+        # List and display pending emails; keys stream from the listing into
+        # the fetch pool, so the first email shows after one LIST page.
+        # Listing errors propagate, and the emails are counted as they come
+        # in (mail may arrive after the counts above).
+        count = 0
+        for count, (s3_key, email) in enumerate(client.fetch_emails(client.list_pending_emails()), 1):
+            if count == 1:
+                print("\nPending emails:\n")
+            print(f"--- Email {count} ---")
             print(f"S3 Key: {s3_key}")
 
-            email = client.fetch_email(s3_key)
             if email:
                 print(f"Message-ID: {email.message_id}")
                 print(f"From: {email.sender_name} <{email.sender}>" if email.sender_name else f"From: {email.sender}")
@@ -261,20 +397,123 @@ def test_ses_connection(config):
                 body_preview = email.body[:500]
                 if len(email.body) > 500:
                     body_preview += "..."
-                print("-" * 40)
+                print(_SEPARATOR)
                 print(body_preview)
-                print("-" * 40)
+                print(_SEPARATOR)
             else:
                 print("  [Failed to parse email]")
 
             print()
 
+        if count:
+            print(f"{count} pending email(s)")
+        else:
+            print("No pending emails in inbox.")
+
     except Exception as e:
         print(f"ERROR: {e}")
         raise
 
 
-def process_single_email(email, ses_client, classifier, db, email_sender=None, workmail_client=None, dry_run=False):
+def is_notification(email):
+    """Check if an email is a bounce, complaint or DMARC report (never classified)."""
+    return (
+        is_bounce_notification(email.sender, email.subject)
+        or is_complaint_notification(email.sender, email.subject)
+        or is_dmarc_report(email.sender, email.subject)
+    )
+
+
+def delete_from_workmail(workmail_client, email, kind, workmail_deletes=None):
+    """Delete a handled email from WorkMail, or queue it for a batched delete.
+
+    Args:
+        workmail_client: WorkMailClient instance (optional)
+        email: Email object
+        kind: Description of the email for log messages
+        workmail_deletes: List collecting message IDs for a batched delete (optional)
+    """
+    if not workmail_client or not email.message_id:
+        return
+
+    if workmail_deletes is not None:
+        workmail_deletes.append(email.message_id)
+    elif workmail_client.delete_by_message_id(email.message_id):
+        logger.debug(f"Deleted {kind} from WorkMail: {email.message_id}")
+    else:
+        logger.warning(f"Failed to delete {kind} from WorkMail: {email.message_id}")
+
+
+def save_processed(email, ses_client, db, intent_flags, intent_label, handler_result, status="processed",
+                   pending_saves=None):
+    """Save a handled email and move it to processed/, or queue both for a batched flush.
+
+    Args:
+        email: Email object
+        ses_client: SESClient instance
+        db: Database instance
+        intent_flags: Classification result as list of bools
+        intent_label: Intent label string
+        handler_result: Handler result dict
+        status: Processing status
+        pending_saves: List collecting database records for a batched
+            save and S3 move (optional; written immediately if omitted)
+    """
+    record = {
+        "message_id": email.message_id,
+        "s3_key": email.s3_key,
+        "sender": email.sender,
+        "sender_name": email.sender_name,
+        "recipient": email.recipient,
+        "subject": email.subject,
+        "body": email.body,
+        "received_at": email.received_at,
+        "intent_flags": intent_flags,
+        "intent_label": intent_label,
+        "handler_result": handler_result,
+        "status": status,
+    }
+    if pending_saves is not None:
+        pending_saves.append(record)
+        return
+
+    db.save_email(**record)
+    ses_client.mark_processed(email.s3_key)
+
+
+def flush_processed(ses_client, db, pending_saves):
+    """Save queued records in one statement, then move their emails to processed/.
+
+    The batched insert is all-or-nothing, so if it fails each record is
+    retried on its own. Only saved emails are moved to processed/; emails
+    whose record could not be saved go to failed/ rather than staying in
+    incoming/, where they would be handled (and replied to) again.
+
+    Args:
+        ses_client: SESClient instance
+        db: Database instance
+        pending_saves: Records queued by save_processed()
+    """
+    if not pending_saves:
+        return
+
+    saved = pending_saves
+    if not db.save_email_many(pending_saves):
+        logger.warning(f"Batched save of {len(pending_saves)} email(s) failed, saving one at a time")
+        saved = []
+        for record in pending_saves:
+            if db.save_email(**record) is not None:
+                saved.append(record)
+            else:
+                logger.error(f"Failed to save processed email {record['message_id']}, moving to failed/")
+                ses_client.mark_failed(record["s3_key"])
+
+    moved = ses_client.mark_processed_many([record["s3_key"] for record in saved])
+    logger.debug(f"Moved {moved} of {len(saved)} email(s) to processed/")
+
+
+def process_single_email(email, ses_client, classifier, db, email_sender=None, workmail_client=None, dry_run=False,
+                         classification=None, already_processed=None, workmail_deletes=None, pending_saves=None):
     """Process a single email through classification and handling.
 
     Args:
@@ -285,13 +524,24 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
         email_sender: EmailSender instance (optional)
         workmail_client: WorkMailClient instance (optional)
         dry_run: If True, don't modify S3 or send responses
+        classification: Precomputed ClassificationResult (optional, from a batch)
+        already_processed: Set of message IDs known to be in the database
+            (optional, from a batched lookup; queried per email if omitted)
+        workmail_deletes: List collecting message IDs to delete from WorkMail
+            in one batch (optional; deleted immediately if omitted)
+        pending_saves: List collecting database records to save and move to
+            processed/ in one batch (optional; written immediately if omitted)
 
     Returns:
         True if processed successfully, False otherwise
     """
     try:
         # Check if already processed (deduplication)
-        if db.email_exists(email.message_id):
+        if already_processed is not None:
+            exists = email.message_id in already_processed
+        else:
+            exists = db.email_exists(email.message_id)
+        if exists:
             logger.debug(f"Email {email.message_id} already processed, skipping")
             if not dry_run:
                 ses_client.mark_processed(email.s3_key)
@@ -302,28 +552,11 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
         if bounce_result:
             # This is a bounce notification - store it with special handling
             if not dry_run:
-                db.save_email(
-                    message_id=email.message_id,
-                    s3_key=email.s3_key,
-                    sender=email.sender,
-                    sender_name=email.sender_name,
-                    recipient=email.recipient,
-                    subject=email.subject,
-                    body=email.body,
-                    received_at=email.received_at,
-                    intent_flags=[False, False, False, False, False, False, False, False],  # No intent classification
-                    intent_label="bounce_notification",
-                    handler_result=bounce_result,
-                    status="processed",
-                )
-                ses_client.mark_processed(email.s3_key)
+                save_processed(email, ses_client, db, NO_INTENT_FLAGS, "bounce_notification", bounce_result,
+                               pending_saves=pending_saves)
 
                 # Delete from WorkMail (bounce notifications don't need to be kept)
-                if workmail_client and email.message_id:
-                    if workmail_client.delete_by_message_id(email.message_id):
-                        logger.debug(f"Deleted bounce from WorkMail: {email.message_id}")
-                    else:
-                        logger.warning(f"Failed to delete bounce from WorkMail: {email.message_id}")
+                delete_from_workmail(workmail_client, email, "bounce", workmail_deletes)
 
             return True
 
@@ -332,28 +565,11 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
         if complaint_result:
             # This is a complaint notification - store it with special handling
             if not dry_run:
-                db.save_email(
-                    message_id=email.message_id,
-                    s3_key=email.s3_key,
-                    sender=email.sender,
-                    sender_name=email.sender_name,
-                    recipient=email.recipient,
-                    subject=email.subject,
-                    body=email.body,
-                    received_at=email.received_at,
-                    intent_flags=[False, False, False, False, False, False, False, False],  # No intent classification
-                    intent_label="complaint_notification",
-                    handler_result=complaint_result,
-                    status="processed",
-                )
-                ses_client.mark_processed(email.s3_key)
+                save_processed(email, ses_client, db, NO_INTENT_FLAGS, "complaint_notification", complaint_result,
+                               pending_saves=pending_saves)
 
                 # Delete from WorkMail (complaint notifications don't need to be kept)
-                if workmail_client and email.message_id:
-                    if workmail_client.delete_by_message_id(email.message_id):
-                        logger.debug(f"Deleted complaint from WorkMail: {email.message_id}")
-                    else:
-                        logger.warning(f"Failed to delete complaint from WorkMail: {email.message_id}")
+                delete_from_workmail(workmail_client, email, "complaint", workmail_deletes)
 
             return True
 
@@ -362,72 +578,43 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
         if dmarc_result:
             # This is a DMARC report - store it without sending any reply
             if not dry_run:
-                db.save_email(
-                    message_id=email.message_id,
-                    s3_key=email.s3_key,
-                    sender=email.sender,
-                    sender_name=email.sender_name,
-                    recipient=email.recipient,
-                    subject=email.subject,
-                    body=email.body,
-                    received_at=email.received_at,
-                    intent_flags=[False, False, False, False, False, False, False, False],  # No intent classification
-                    intent_label="dmarc_report",
-                    handler_result=dmarc_result,
-                    status="processed",
-                )
-                ses_client.mark_processed(email.s3_key)
+                save_processed(email, ses_client, db, NO_INTENT_FLAGS, "dmarc_report", dmarc_result,
+                               pending_saves=pending_saves)
 
                 # Delete from WorkMail (DMARC reports don't need to be kept in inbox)
-                if workmail_client and email.message_id:
-                    if workmail_client.delete_by_message_id(email.message_id):
-                        logger.debug(f"Deleted DMARC report from WorkMail: {email.message_id}")
-                    else:
-                        logger.warning(f"Failed to delete DMARC report from WorkMail: {email.message_id}")
+                delete_from_workmail(workmail_client, email, "DMARC report", workmail_deletes)
 
             return True
 
-        # Classify intent
-        logger.debug(f"Classifying email: {email.subject}")
-        result = classifier.classify_with_context(
-            subject=email.subject or "",
-            body=email.body or "",
-            sender=email.sender,
-        )
+        # Classify intent (obvious auto-replies skip the LLM)
+        if classification is not None:
+            result = classification
+        elif is_auto_reply(email.sender, email.subject):
+            result = ClassificationResult(
+                intent=Intent.SPAM_OR_AUTO_REPLY,
+                intent_flags=list(AUTO_REPLY_INTENT_FLAGS),
+                raw_response="auto-reply pre-filter",
+            )
+        else:
+            logger.debug("Classifying email: %s", email.subject)
+            result = classifier.classify_with_context(
+                subject=email.subject or "",
+                body=email.body or "",
+                sender=email.sender,
+            )
 
-        logger.info(
-            f"Email from {email.sender}: intent={result.intent_label} "
-            f"subject=\"{email.subject[:50]}...\"" if email.subject and len(email.subject) > 50
-            else f"Email from {email.sender}: intent={result.intent_label} subject=\"{email.subject}\""
-        )
+        # %.50s truncates the subject during (lazy) formatting
+        logger.info('Email from %s: intent=%s subject="%.50s"', email.sender, result.intent_label, email.subject or "")
 
         # Handle spam/auto-reply specially - blacklist sender and delete from WorkMail
-        from classifier import Intent
         if result.intent == Intent.SPAM_OR_AUTO_REPLY:
             auto_reply_result = handle_auto_reply(email, db, dry_run)
             if not dry_run:
-                db.save_email(
-                    message_id=email.message_id,
-                    s3_key=email.s3_key,
-                    sender=email.sender,
-                    sender_name=email.sender_name,
-                    recipient=email.recipient,
-                    subject=email.subject,
-                    body=email.body,
-                    received_at=email.received_at,
-                    intent_flags=result.intent_flags,
-                    intent_label=result.intent_label,
-                    handler_result=auto_reply_result,
-                    status="processed",
-                )
-                ses_client.mark_processed(email.s3_key)
+                save_processed(email, ses_client, db, result.intent_flags, result.intent_label, auto_reply_result,
+                               pending_saves=pending_saves)
 
                 # Delete from WorkMail (auto-replies don't need to be kept)
-                if workmail_client and email.message_id:
-                    if workmail_client.delete_by_message_id(email.message_id):
-                        logger.debug(f"Deleted auto-reply from WorkMail: {email.message_id}")
-                    else:
-                        logger.warning(f"Failed to delete auto-reply from WorkMail: {email.message_id}")
+                delete_from_workmail(workmail_client, email, "auto-reply", workmail_deletes)
 
             return True
 
@@ -449,23 +636,8 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
 
         # Save to database
         if not dry_run:
-            db.save_email(
-                message_id=email.message_id,
-                s3_key=email.s3_key,
-                sender=email.sender,
-                sender_name=email.sender_name,
-                recipient=email.recipient,
-                subject=email.subject,
-                body=email.body,
-                received_at=email.received_at,
-                intent_flags=result.intent_flags,
-                intent_label=result.intent_label,
-                handler_result=handler_result,
-                status=status,
-            )
-
-            # Mark as processed in S3
-            ses_client.mark_processed(email.s3_key)
+            save_processed(email, ses_client, db, result.intent_flags, result.intent_label, handler_result, status=status,
+                           pending_saves=pending_saves)
 
         return True
 
@@ -479,6 +651,17 @@ def process_single_email(email, ses_client, classifier, db, email_sender=None, w
         return False
 
 
+# Intent -> (handler, database argument: None, "optional" or "required")
+INTENT_HANDLERS = {
+    Intent.SEND_INFO: (handle_send_info, None),
+    Intent.CREATE_ACCOUNT: (handle_create_account, "required"),
+    Intent.SPEAK_TO_HUMAN: (handle_speak_to_human, None),
+    Intent.EMAIL_TO_HUMAN: (handle_email_to_human, None),
+    Intent.UNKNOWN: (handle_unknown, None),
+    Intent.UNSUBSCRIBE: (handle_unsubscribe, "optional"),
+}
+
+
 def route_to_handler(intent, email, email_sender=None, db=None, dry_run=False):
     """Route email to appropriate handler based on intent.
 
@@ -492,85 +675,36 @@ def route_to_handler(intent, email, email_sender=None, db=None, dry_run=False):
     Returns:
         Dict with handler result data
     """
-    from classifier import Intent
-
-    handler_result = {
-        "intent": intent.label,
-        "dry_run": dry_run,
-    }
-
-    if intent == Intent.SEND_INFO:
-        logger.debug(f"Handler: send_info for {email.sender}")
-        if email_sender:
-            handler_result = handle_send_info(email, email_sender, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "send_info"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender not configured"
-
-    elif intent == Intent.CREATE_ACCOUNT:
-        logger.debug(f"Handler: create_account for {email.sender}")
-        if email_sender and db:
-            handler_result = handle_create_account(email, email_sender, db, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "create_account"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender or Database not configured"
-
-    elif intent == Intent.SPEAK_TO_HUMAN:
-        logger.debug(f"Handler: speak_to_human for {email.sender}")
-        if email_sender:
-            handler_result = handle_speak_to_human(email, email_sender, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "speak_to_human"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender not configured"
-
-    elif intent == Intent.EMAIL_TO_HUMAN:
-        logger.debug(f"Handler: email_to_human for {email.sender}")
-        if email_sender:
-            handler_result = handle_email_to_human(email, email_sender, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "email_to_human"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender not configured"
-
-    elif intent == Intent.UNKNOWN:
-        logger.debug(f"Handler: unknown for {email.sender}")
-        if email_sender:
-            handler_result = handle_unknown(email, email_sender, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "unknown"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender not configured"
-
-    elif intent == Intent.SPAM_OR_AUTO_REPLY:
+    if intent == Intent.SPAM_OR_AUTO_REPLY:
         # Handled earlier in process_single_email (blacklisted and deleted from WorkMail)
         # This is a fallback that shouldn't normally be reached
-        logger.debug(f"Spam/auto-reply fallback handler for {email.sender}")
-        handler_result["action"] = "ignore"
-        handler_result["status"] = "ignored"
-
-    elif intent == Intent.UNSUBSCRIBE:
-        logger.debug(f"Handler: unsubscribe for {email.sender}")
-        if email_sender:
-            handler_result = handle_unsubscribe(email, email_sender, db, dry_run)
-            handler_result["intent"] = intent.label
-        else:
-            handler_result["action"] = "unsubscribe"
-            handler_result["status"] = "error"
-            handler_result["error"] = "EmailSender not configured"
+        logger.debug("Spam/auto-reply fallback handler for %s", email.sender)
+        return {"intent": intent.label, "dry_run": dry_run, "action": "ignore", "status": "ignored"}
 
-    else:
+    entry = INTENT_HANDLERS.get(intent)
+    if entry is None:
         # Reserved or unexpected
-        logger.warning(f"No handler for intent: {intent}")
-        handler_result["action"] = "none"
-        handler_result["status"] = "no_handler"
+        logger.warning("No handler for intent: %s", intent)
+        return {"intent": intent.label, "dry_run": dry_run, "action": "none", "status": "no_handler"}
+
+    handler, db_arg = entry
+    logger.debug("Handler: %s for %s", intent.label, email.sender)
+
+    if not email_sender or (db_arg == "required" and not db):
+        return {
+            "intent": intent.label,
+            "dry_run": dry_run,
+            "action": intent.label,
+            "status": "error",
+            "error": "EmailSender or Database not configured" if db_arg == "required" else "EmailSender not configured",
+        }
+
+    # The handler builds the result; only the intent label is added here
+    if db_arg:
+        handler_result = handler(email, email_sender, db, dry_run)
+    else:
+        handler_result = handler(email, email_sender, dry_run)
+    handler_result["intent"] = intent.label
 
     return handler_result
 
@@ -591,8 +725,8 @@ def process_emails(ses_client, classifier, db, email_sender=None, workmail_clien
     """
     logger.debug("Checking for new emails...")
 
-    # List pending emails
-    pending_keys = list(ses_client.list_pending_emails())
+    # List the next batch of pending emails
+    pending_keys = ses_client.next_pending_batch()
 
     if not pending_keys:
         logger.debug("No pending emails")
@@ -601,22 +735,119 @@ def process_emails(ses_client, classifier, db, email_sender=None, workmail_clien
     logger.info(f"Found {len(pending_keys)} pending email(s)")
 
     processed_count = 0
-    for s3_key in pending_keys:
-        # Fetch and parse email
-        email = ses_client.fetch_email(s3_key)
+
+    # Objects already saved under the same key only need moving out of
+    # incoming/ - skip the S3 GET and MIME parse for them
+    already_saved = db.s3_keys_existing(pending_keys)
+    if already_saved:
+        logger.debug(f"{len(already_saved)} pending email(s) already processed, skipping")
+        processed_count += len(already_saved) if dry_run else ses_client.mark_processed_many(already_saved)
+        pending_keys = [key for key in pending_keys if key not in already_saved]
+
+    batch = []
+
+    def process_batch():
+        # Deduplicate with one query, classify the remaining emails with
+        # concurrent LLM calls, then handle each email
+        nonlocal processed_count
+
+        # Later copies of a Message-ID within the batch are only moved, like
+        # already processed emails; the handlers run concurrently and save
+        # at the end of the batch, so each copy would otherwise get a reply
+        unique = {}
+        for email in batch:
+            unique.setdefault(email.message_id, email)
+        if len(unique) < len(batch):
+            duplicates = [email.s3_key for email in batch if unique[email.message_id] is not email]
+            logger.debug(f"{len(duplicates)} duplicate email(s) in batch, skipping")
+            processed_count += len(duplicates) if dry_run else ses_client.mark_processed_many(duplicates)
+            batch[:] = unique.values()
+
+        already_processed = db.email_exists_many([email.message_id for email in batch])
+        needs_classification = [
+            email.message_id not in already_processed
+            and not is_notification(email)
+            and not is_auto_reply(email.sender, email.subject)
+            for email in batch
+        ]
+        results = iter(classifier.classify_batch([
+            (email.subject or "", email.body or "", email.sender)
+            for email, classify in zip(batch, needs_classification) if classify
+        ]))
+
+        classifications = [next(results) if classify else None for classify in needs_classification]
+
+        # Handlers (and their SES sends) run concurrently; their database
+        # writes and S3 moves are queued and flushed once below
+        workmail_deletes = []
+        pending_saves = []
+        handle = functools.partial(
+            process_single_email, ses_client=ses_client, classifier=classifier, db=db,
+            email_sender=email_sender, workmail_client=workmail_client, dry_run=dry_run,
+            already_processed=already_processed, workmail_deletes=workmail_deletes, pending_saves=pending_saves,
+        )
+        with ThreadPoolExecutor(max_workers=min(HANDLER_CONCURRENCY, len(batch))) as pool:
+            processed_count += sum(pool.map(
+                lambda email, classification: handle(email, classification=classification),
+                batch, classifications,
+            ))
+        batch.clear()
+
+        # Save the batch in one statement, then move it to processed/
+        flush_processed(ses_client, db, pending_saves)
+
+        # Remove handled notifications/auto-replies from WorkMail in one pass
+        if workmail_deletes:
+            deleted = workmail_client.delete_by_message_ids(workmail_deletes)
+            logger.debug(f"Deleted {deleted} of {len(workmail_deletes)} email(s) from WorkMail")
+
+    # Fetch and parse emails (prefetched concurrently ahead of processing)
+    for s3_key, email in ses_client.fetch_emails(pending_keys):
         if not email:
             logger.warning(f"Failed to fetch email: {s3_key}")
             if not dry_run:
                 ses_client.mark_failed(s3_key)
             continue
 
-        # Process the email
-        if process_single_email(email, ses_client, classifier, db, email_sender, workmail_client, dry_run):
-            processed_count += 1
+        batch.append(email)
+        if len(batch) >= CLASSIFY_BATCH_SIZE:
+            process_batch()
+
+    if batch:
+        process_batch()
 
     return processed_count
 
 
+def wait_for_stop(stop, wakeup_fd, timeout):
+    """Block until the timeout elapses or a signal sets the stop event.
+
+    Sleeps in select() on the signal wakeup fd rather than in
+    stop.wait(): Event.set() from a signal handler can deadlock if the
+    signal lands while the main thread holds the event's internal lock.
+
+    Args:
+        stop: threading.Event set by the signal handler
+        wakeup_fd: Read end of the signal.set_wakeup_fd pipe
+        timeout: Maximum time to wait, in seconds
+
+    Returns:
+        True if stop was requested, False on timeout
+    """
+    deadline = time.monotonic() + timeout
+    while not stop.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        ready, _, _ = select.select([wakeup_fd], [], [], remaining)
+        if ready:
+            try:
+                os.read(wakeup_fd, 64)
+            except BlockingIOError:
+                pass
+    return True
+
+
 def run(args, config):
     """Main processing loop."""
     if args.dry_run:
@@ -663,22 +894,38 @@ def run(args, config):
         return
 
     logger.info("All services initialized successfully")
+    sd_notify("READY=1")
 
     # Handle graceful shutdown
-    running = True
+    stop = threading.Event()
 
     def signal_handler(signum, frame):
-        nonlocal running
         logger.info(f"Received signal {signum}, shutting down...")
-        running = False
+        stop.set()
+
+    old_sigterm = signal.signal(signal.SIGTERM, signal_handler)
+    old_sigint = signal.signal(signal.SIGINT, signal_handler)
 
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
+    # Self-pipe: CPython writes the signal number to wakeup_w from its
+    # low-level handler, which wakes the select() in wait_for_stop()
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    old_wakeup_fd = signal.set_wakeup_fd(wakeup_w)
 
     logger.info(f"Starting processing loop (interval: {args.interval}s)")
 
+    # Adaptive polling: poll quickly for a few cycles after processing mail,
+    # back off towards MAX_POLL_INTERVAL while the inbox stays empty. Dry
+    # runs leave mail in incoming/, where every poll would find it again,
+    # so they keep the plain interval.
+    max_interval = max(MAX_POLL_INTERVAL, args.interval)
+    wait = 0
+    active_cycles = 0
+
     try:
-        while running:
+        while not stop.is_set():
+            count = 0
             try:
                 count = process_emails(ses_client, classifier, db, email_sender, workmail_client, dry_run=args.dry_run)
                 if count > 0:
@@ -690,21 +937,45 @@ def run(args, config):
                 logger.info("Single run complete, exiting")
                 break
 
-            # Sleep in small increments to allow signal handling
-            for _ in range(args.interval):
-                if not running:
-                    break
-                time.sleep(1)
+            # More keys are waiting in the listing: continue without sleeping
+            if ses_client.has_more_pending:
+                continue
+
+            if count > 0 and not args.dry_run:
+                active_cycles = ACTIVE_POLL_CYCLES
+            if args.dry_run:
+                wait = args.interval
+            elif active_cycles > 0:
+                active_cycles -= 1
+                wait = min(ACTIVE_POLL_INTERVAL, args.interval)
+            elif wait < args.interval:
+                wait = args.interval
+            else:
+                wait = min(wait * POLL_BACKOFF, max_interval)
+
+            logger.debug(f"Next poll in {wait:.0f}s")
+            wait_for_stop(stop, wakeup_r, wait)
     finally:
         # Cleanup
+        signal.set_wakeup_fd(old_wakeup_fd)
+        signal.signal(signal.SIGTERM, old_sigterm)
+        signal.signal(signal.SIGINT, old_sigint)
+        os.close(wakeup_r)
+        os.close(wakeup_w)
+        sd_notify("STOPPING=1")
         if workmail_client:
             workmail_client.disconnect()
             logger.debug("Disconnected from WorkMail")
+        db.close()
+
 
+def main(argv=None):
+    """Main entry point for the daemon.
 
-def main():
-    """Main entry point for the daemon."""
-    args = parse_args()
+    Args:
+        argv: Command line arguments (defaults to sys.argv[1:])
+    """
+    args = parse_args(argv)
 
     # Load configuration from .env file
     config_path = Path(args.config) if args.config else None
@@ -712,24 +983,20 @@ def main():
 
     # Handle --test-creds: validate and exit
     if args.test_creds:
-        print(f"Testing credentials from: {args.config}")
-        print("-" * 40)
         errors, warnings, success = check_credentials(config)
 
-        for msg in success:
-            print(f"  [OK] {msg}")
-        for msg in warnings:
-            print(f"  [WARN] {msg}")
-        for msg in errors:
-            print(f"  [ERROR] {msg}")
-
-        print("-" * 40)
+        lines = [f"Testing credentials from: {args.config}", _SEPARATOR]
+        lines += [f"  [OK] {msg}" for msg in success]
+        lines += [f"  [WARN] {msg}" for msg in warnings]
+        lines += [f"  [ERROR] {msg}" for msg in errors]
+        lines.append(_SEPARATOR)
         if errors:
-            print(f"FAILED: {len(errors)} missing credential(s)")
-            sys.exit(1)
+            lines.append(f"FAILED: {len(errors)} missing credential(s)")
         else:
-            print("SUCCESS: All required credentials configured")
-            sys.exit(0)
+            lines.append("SUCCESS: All required credentials configured")
+
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.exit(1 if errors else 0)
 
     # Handle --test-ses: read and display emails from S3
     if args.test_ses:
@@ -737,12 +1004,9 @@ def main():
         sys.exit(0)
 
     # Command line args override config file settings
-    log_file = args.log_file or config.daemon.log_file
-    pid_file = args.pid_file or config.daemon.pid_file
-    interval = args.interval if args.interval != 60 else config.daemon.poll_interval
-
-    # Update args with resolved values
-    args.interval = interval
+    args.interval = _resolve(args.interval, config.daemon.poll_interval, 60)
+    log_file = _resolve(args.log_file, config.daemon.log_file)
+    pid_file = _resolve(args.pid_file, config.daemon.pid_file)
 
     # Daemon mode requires log file (stdout is /dev/null)
     if args.daemon and not log_file:
@@ -756,23 +1020,28 @@ def main():
         setup_logging(verbose=args.verbose, log_file=log_file)
 
     if args.daemon:
-        daemonize()
+        daemonize(already_detached=args.already_daemonized)
         # Setup logging after daemonize
         setup_logging(verbose=args.verbose, log_file=log_file)
 
     # Write PID file after daemonizing (so we get the final PID)
-    if pid_file:
-        write_pid_file(pid_file)
+    remove_pid_file = write_pid_file(pid_file) if pid_file else None
 
-    logger.info(f"Loaded config from {args.config}")
-    logger.info(f"ses-daemon-bot v{__version__} starting")
+    logger.info("ses-daemon-bot v%s starting (config=%s)", __version__, args.config)
 
     # Log config summary (without secrets)
-    logger.debug(f"AWS Region: {config.aws.region}")
-    logger.debug(f"SES Bucket: {config.aws.ses_bucket}")
-    logger.debug(f"LLM Model: {config.llm.model}")
+    logger.debug(
+        "AWS Region: %s, SES Bucket: %s, LLM Model: %s",
+        config.aws.region, config.aws.ses_bucket, config.llm.model,
+    )
 
-    run(args, config)
+    try:
+        run(args, config)
+    finally:
+        # Remove the PID file on the shutdown path (SIGTERM/SIGINT end the
+        # run loop) rather than from atexit during interpreter teardown
+        if remove_pid_file:
+            remove_pid_file()
     logger.info("ses-daemon-bot stopped")
 
 
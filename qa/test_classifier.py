@@ -1,13 +1,10 @@
 """Tests for intent classifier."""
 
-import os
-import sys
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
-from classifier import Classifier, ClassificationResult, Intent
+from classifier import Classifier, ClassificationResult, Intent, _get_openai
 from config import LLMConfig
 
 
@@ -48,7 +45,30 @@ def test_classification_result():
     assert result.to_json() == "[true, false, false, false, false, false, false, false]"
 
 
-@patch("classifier.OpenAI")
+@pytest.fixture(autouse=True)
+def clear_openai_clients():
+    """Keep patched OpenAI clients out of the shared client cache."""
+    _get_openai.cache_clear()
+    yield
+    _get_openai.cache_clear()
+
+
+@pytest.fixture(scope="module")
+def shared_classifier():
+    """Build one Classifier for the module (its client is replaced per test)."""
+    with patch("openai.OpenAI"):
+        yield Classifier(LLMConfig(api_key="test-key", model="gpt-4"))
+
+
+@pytest.fixture
+def classifier(shared_classifier, fake_openai):
+    """The shared Classifier, with a fresh fake client and empty cache."""
+    shared_classifier.client = fake_openai
+    shared_classifier._cache.clear()
+    return shared_classifier
+
+
+@patch("openai.OpenAI")
 def test_classifier_init(mock_openai):
     """Test Classifier initialization."""
     config = LLMConfig(
@@ -62,95 +82,38 @@ def test_classifier_init(mock_openai):
     mock_openai.assert_called_once_with(api_key="test-key")
 
 
-@patch("classifier.OpenAI")
-def test_classifier_parse_valid_response(mock_openai):
-    """Test parsing valid LLM response."""
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
-
-    # Test send_info
-    result = classifier._parse_response("[true, false, false, false, false, false, false, false]")
-    assert result.intent == Intent.SEND_INFO
-    assert result.intent_flags == [True, False, False, False, False, False, False, False]
-
-    # Test create_account
-    result = classifier._parse_response("[false, true, false, false, false, false, false, false]")
-    assert result.intent == Intent.CREATE_ACCOUNT
-
-    # Test speak_to_human
-    result = classifier._parse_response("[false, false, false, true, false, false, false, false]")
-    assert result.intent == Intent.SPEAK_TO_HUMAN
-
-    # Test unsubscribe
-    result = classifier._parse_response("[false, false, false, false, false, false, true, false]")
-    assert result.intent == Intent.UNSUBSCRIBE
-
-
-@patch("classifier.OpenAI")
-def test_classifier_parse_invalid_json(mock_openai):
-    """Test parsing invalid JSON response defaults to unknown."""
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
-
-    result = classifier._parse_response("not valid json")
-    assert result.intent == Intent.UNKNOWN
-    assert result.intent_flags == [False, False, True, False, False, False, False, False]
-
-
-@patch("classifier.OpenAI")
-def test_classifier_parse_wrong_length(mock_openai):
-    """Test parsing response with wrong array length."""
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
-
-    result = classifier._parse_response("[true, false, false]")
-    assert result.intent == Intent.UNKNOWN
-
-
-@patch("classifier.OpenAI")
-def test_classifier_parse_multiple_true(mock_openai):
-    """Test parsing response with multiple true values defaults to unknown."""
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
-
-    result = classifier._parse_response("[true, true, false, false, false, false, false, false]")
-    assert result.intent == Intent.UNKNOWN
-
-
-@patch("classifier.OpenAI")
-def test_classify_call(mock_openai):
+@pytest.mark.parametrize("raw_response, expected_intent", [
+    ("[true, false, false, false, false, false, false, false]", Intent.SEND_INFO),
+    ("[false, true, false, false, false, false, false, false]", Intent.CREATE_ACCOUNT),
+    ("[false, false, false, true, false, false, false, false]", Intent.SPEAK_TO_HUMAN),
+    ("[false, false, false, false, false, false, true, false]", Intent.UNSUBSCRIBE),
+    # Invalid JSON, wrong array length and multiple true values default to unknown
+    ("not valid json", Intent.UNKNOWN),
+    ("[true, false, false]", Intent.UNKNOWN),
+    ("[true, true, false, false, false, false, false, false]", Intent.UNKNOWN),
+])
+def test_classifier_parse_response(classifier, raw_response, expected_intent):
+    """Test parsing LLM responses, including invalid ones."""
+    result = classifier._parse_response(raw_response)
+    assert result.intent == expected_intent
+    assert result.intent_flags == [i == expected_intent for i in Intent]
+
+
+def test_classify_call(classifier):
     """Test full classify call."""
-    # Setup mock
-    mock_client = MagicMock()
-    mock_openai.return_value = mock_client
-
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = "[false, true, false, false, false, false, false, false]"
-    mock_client.chat.completions.create.return_value = mock_response
-
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
+    completions = classifier.client.chat.completions
+    completions.content = "[false, true, false, false, false, false, false, false]"
 
     result = classifier.classify("I want to sign up for your service")
 
     assert result.intent == Intent.CREATE_ACCOUNT
-    mock_client.chat.completions.create.assert_called_once()
+    assert len(completions.calls) == 1
 
 
-@patch("classifier.OpenAI")
-def test_classify_with_context(mock_openai):
+def test_classify_with_context(classifier):
     """Test classify_with_context builds proper email text."""
-    mock_client = MagicMock()
-    mock_openai.return_value = mock_client
-
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message.content = "[true, false, false, false, false, false, false, false]"
-    mock_client.chat.completions.create.return_value = mock_response
-
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
+    completions = classifier.client.chat.completions
+    completions.content = "[true, false, false, false, false, false, false, false]"
 
     result = classifier.classify_with_context(
         subject="Pricing question",
@@ -161,25 +124,73 @@ def test_classify_with_context(mock_openai):
     assert result.intent == Intent.SEND_INFO
 
     # Check that the call included all context
-    call_args = mock_client.chat.completions.create.call_args
-    prompt = call_args.kwargs["messages"][0]["content"]
+    prompt = completions.calls[-1]["messages"][0]["content"]
     assert "test@example.com" in prompt
     assert "Pricing question" in prompt
     assert "How much does your service cost?" in prompt
 
 
-@patch("classifier.OpenAI")
-def test_classify_api_error(mock_openai):
+def test_classify_api_error(classifier):
     """Test classify handles API errors gracefully."""
-    mock_client = MagicMock()
-    mock_openai.return_value = mock_client
-    mock_client.chat.completions.create.side_effect = Exception("API Error")
-
-    config = LLMConfig(api_key="test-key", model="gpt-4")
-    classifier = Classifier(config)
+    classifier.client.chat.completions.error = Exception("API Error")
 
     result = classifier.classify("test email")
 
     # Should return unknown on error
     assert result.intent == Intent.UNKNOWN
     assert "API Error" in result.raw_response
+
+
+def test_classify_batch(classifier):
+    """Test classify_batch returns one result per item in input order."""
+    completions = classifier.client.chat.completions
+
+    responses = {
+        "Pricing": "[true, false, false, false, false, false, false, false]",
+        "Sign up": "[false, true, false, false, false, false, false, false]",
+        "Call me": "[false, false, false, true, false, false, false, false]",
+    }
+
+    def respond(kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        return next(v for k, v in responses.items() if f"Subject: {k}" in prompt)
+
+    completions.respond = respond
+
+    results = classifier.classify_batch([
+        ("Pricing", "How much?", "a@example.com"),
+        ("Sign up", "Register me", "b@example.com"),
+        ("Call me", "Phone please", "c@example.com"),
+    ])
+
+    assert [r.intent for r in results] == [Intent.SEND_INFO, Intent.CREATE_ACCOUNT, Intent.SPEAK_TO_HUMAN]
+    assert len(completions.calls) == 3
+    assert classifier.classify_batch([]) == []
+
+
+def test_classify_with_context_caches_near_duplicates(classifier):
+    """Test near-identical emails reuse a cached classification."""
+    completions = classifier.client.chat.completions
+    completions.content = "[false, false, false, false, false, false, true, false]"
+
+    first = classifier.classify_with_context("Unsubscribe", "Please remove me.", "a@example.com")
+    second = classifier.classify_with_context("unsubscribe", "  please  REMOVE me.\n", "A@example.com")
+
+    assert first.intent == second.intent == Intent.UNSUBSCRIBE
+    assert len(completions.calls) == 1
+
+    # The sender is part of the prompt, so another sender is classified again
+    classifier.classify_with_context("Unsubscribe", "Please remove me.", "b@example.com")
+    assert len(completions.calls) == 2
+
+
+def test_classify_with_context_skips_caching_invalid(classifier):
+    """Test defaulted classifications of invalid responses are not cached."""
+    completions = classifier.client.chat.completions
+    completions.content = "[true, true, false, false, false, false, false, false]"
+
+    first = classifier.classify_with_context("Hello", "Hi there", "a@example.com")
+    classifier.classify_with_context("Hello", "Hi there", "a@example.com")
+
+    assert first.intent == Intent.UNKNOWN
+    assert len(completions.calls) == 4  # two attempts per call
@@ -1,86 +1,164 @@
 """Tests for command line interface."""
 
-import subprocess
-import sys
+import logging
+from unittest.mock import MagicMock
 
+import pytest
+from botocore.exceptions import ClientError
 
-def test_help_option():
+import main
+
+
+@pytest.fixture
+def cli(monkeypatch, capsys):
+    """Run main.main() in-process with service clients stubbed out.
+
+    Returns a function taking the argument list and returning
+    (exit code, stdout, stderr).
+    """
+    for name in ("SESClient", "Classifier", "Database", "EmailSender", "WorkMailClient"):
+        monkeypatch.setattr(main, name, MagicMock())
+    main.SESClient.return_value.has_more_pending = False
+    monkeypatch.setattr(main, "process_emails", MagicMock(return_value=0))
+
+    root = logging.getLogger()
+
+    def run(args):
+        # Let setup_logging() install its own handler on a clean root logger
+        saved_handlers, saved_level = root.handlers[:], root.level
+        root.handlers = []
+        try:
+            main.main(args)
+            code = 0
+        except SystemExit as e:
+            code = e.code or 0
+        finally:
+            for handler in root.handlers:
+                handler.close()
+            root.handlers = saved_handlers
+            root.setLevel(saved_level)
+        out, err = capsys.readouterr()
+        return code, out, err
+
+    return run
+
+
+def test_help_option(cli):
     """Test --help displays usage information."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--help"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode == 0
-    assert "AWS SES mail processor" in result.stdout
-    assert "--daemon" in result.stdout
-    assert "--dry-run" in result.stdout
-    assert "--test-creds" in result.stdout
-    assert "--config" in result.stdout
-
-
-def test_version_option():
+    code, out, err = cli(["--help"])
+    assert code == 0
+    assert "AWS SES mail processor" in out
+    assert "--daemon" in out
+    assert "--dry-run" in out
+    assert "--test-creds" in out
+    assert "--config" in out
+
+
+def test_version_option(cli):
     """Test --version displays version."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--version"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode == 0
-    assert "ses-daemon-bot" in result.stdout
-    assert "0.1.3" in result.stdout
+    code, out, err = cli(["--version"])
+    assert code == 0
+    assert "ses-daemon-bot" in out
+    assert main.__version__ in out
 
 
-def test_dry_run_with_once():
+def test_dry_run_with_once(cli):
     """Test --dry-run --once runs and exits cleanly."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--dry-run", "--once"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode == 0
-    assert "dry-run mode" in result.stderr
+    code, out, err = cli(["--dry-run", "--once"])
+    assert code == 0
+    assert "dry-run mode" in err
 
 
-def test_verbose_logging():
+def test_verbose_logging(cli):
     """Test -v enables debug logging."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "-v", "--once"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode == 0
-    assert "DEBUG" in result.stderr
+    code, out, err = cli(["-v", "--once"])
+    assert code == 0
+    assert "DEBUG" in err
 
 
-def test_invalid_option():
+def test_invalid_option(cli):
     """Test invalid option shows error."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--invalid-option"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode != 0
-    assert "unrecognized arguments" in result.stderr
+    code, out, err = cli(["--invalid-option"])
+    assert code != 0
+    assert "unrecognized arguments" in err
 
 
-def test_interval_option():
+def test_interval_option(cli):
     """Test --interval accepts integer value."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--interval", "30", "--once"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode == 0
-    assert "interval: 30s" in result.stderr
+    code, out, err = cli(["--interval", "30", "--once"])
+    assert code == 0
+    assert "interval: 30s" in err
 
 
-def test_interval_invalid_value():
+def test_interval_invalid_value(cli):
     """Test --interval rejects non-integer value."""
-    result = subprocess.run(
-        [sys.executable, "main.py", "--interval", "abc"],
-        capture_output=True,
-        text=True,
-    )
-    assert result.returncode != 0
-    assert "invalid int value" in result.stderr
+    code, out, err = cli(["--interval", "abc"])
+    assert code != 0
+    assert "invalid int value" in err
+
+
+@pytest.mark.parametrize("args, expected_wait", [
+    (["--interval", "30"], main.ACTIVE_POLL_INTERVAL),
+    # Dry runs find the same mail on every poll, so they never poll faster
+    (["--dry-run", "--interval", "30"], 30),
+])
+def test_poll_interval_after_mail(cli, monkeypatch, args, expected_wait):
+    """Test finding mail re-arms fast polling, except in dry-run mode."""
+    main.process_emails.return_value = 2
+    waits = []
+
+    def wait_for_stop(stop, wakeup_fd, timeout):
+        waits.append(timeout)
+        if len(waits) == 3:
+            stop.set()
+        return stop.is_set()
+
+    monkeypatch.setattr(main, "wait_for_stop", wait_for_stop)
+
+    code, out, err = cli(args)
+
+    assert code == 0
+    assert waits == [expected_wait] * 3
+
+
+@pytest.fixture
+def test_ses_client(cli):
+    """The SESClient used by --test-ses, serving ``keys`` from its listing."""
+    client = main.SESClient.return_value
+    client.keys = []
+    client.get_email_count_by_prefix.return_value = {"incoming": 1, "processed": 0, "failed": 0}
+    client.list_pending_emails.side_effect = lambda: iter(client.keys)
+    client.fetch_emails.side_effect = lambda keys: ((key, None) for key in keys)
+    return client
+
+
+def test_test_ses_counts_streamed_emails(cli, test_ses_client):
+    """Test --test-ses numbers the emails as the listing yields them."""
+    test_ses_client.keys = ["emails/a", "emails/b"]
+
+    code, out, err = cli(["--test-ses"])
+
+    assert code == 0
+    assert "--- Email 2 ---" in out
+    assert "2 pending email(s)" in out
+
+
+def test_test_ses_no_pending(cli, test_ses_client):
+    """Test --test-ses reports an empty inbox from the listing, not the counts."""
+    code, out, err = cli(["--test-ses"])
+
+    assert code == 0
+    assert "No pending emails in inbox." in out
+
+
+def test_test_ses_listing_error(cli, test_ses_client):
+    """Test --test-ses fails when the incoming listing fails."""
+    def failing_listing():
+        raise ClientError({"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "ListObjectsV2")
+        yield
+
+    test_ses_client.get_email_count_by_prefix.return_value = {"incoming": 0, "processed": 0, "failed": 0}
+    test_ses_client.list_pending_emails.side_effect = failing_listing
+
+    with pytest.raises(ClientError):
+        cli(["--test-ses"])
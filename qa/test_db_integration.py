@@ -1,26 +1,26 @@
 """Integration tests for database operations.
 
-These tests require a live connection to the Neon database.
-Run with: pytest qa/test_db_integration.py -v
-"""
+These tests require a live connection to the Neon database and are
+skipped unless pytest runs with --run-integration:
 
-import os
-import sys
+    pytest qa/test_db_integration.py --run-integration -v
+"""
 
 import pytest
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from config import load_config
 from db import Database
 
+pytestmark = pytest.mark.integration
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def db():
-    """Create a database connection using real credentials."""
+    """Create one pooled database client, using real credentials, for the session."""
     config = load_config()
-    return Database(config.database)
+    db = Database(config.database)
+    yield db
+    db.close()
 
 
 def test_database_connection(db):
@@ -42,7 +42,43 @@ def test_ses_emails_table_exists(db):
         assert result["exists"] is True, "ses_emails table does not exist"
 
 
-def test_ses_emails_table_columns(db):
+# One round-trip for every schema fact the tests below check
+SCHEMA_SNAPSHOT_QUERY = """
+    SELECT 'column' AS kind, column_name::text AS name, data_type::text AS detail,
+           is_nullable::text AS nullable, column_default::text AS column_default
+    FROM information_schema.columns
+    WHERE table_name = 'ses_emails'
+    UNION ALL
+    SELECT 'constraint', constraint_name::text, constraint_type::text, NULL, NULL
+    FROM information_schema.table_constraints
+    WHERE table_name = 'ses_emails'
+    UNION ALL
+    SELECT 'index', indexname::text, NULL, NULL, NULL
+    FROM pg_indexes
+    WHERE tablename = 'ses_emails';
+"""
+
+
+@pytest.fixture(scope="session")
+def schema_snapshot(db):
+    """Read the ses_emails columns, constraints and indexes in one query."""
+    snapshot = {"columns": {}, "nullable": {}, "defaults": {}, "constraints": {}, "indexes": []}
+    with db.get_cursor(commit=False) as cursor:
+        cursor.execute(SCHEMA_SNAPSHOT_QUERY)
+        for row in cursor.fetchall():
+            if row["kind"] == "column":
+                snapshot["columns"][row["name"]] = row["detail"]
+                snapshot["nullable"][row["name"]] = row["nullable"]
+                if row["column_default"] is not None:
+                    snapshot["defaults"][row["name"]] = row["column_default"]
+            elif row["kind"] == "constraint":
+                snapshot["constraints"][row["name"]] = row["detail"]
+            else:
+                snapshot["indexes"].append(row["name"])
+    return snapshot
+
+
+def test_ses_emails_table_columns(schema_snapshot):
     """Test that ses_emails table has all required columns."""
     expected_columns = {
         "id": "integer",
@@ -61,14 +97,7 @@ def test_ses_emails_table_columns(db):
         "status": "text",
     }
 
-    with db.get_cursor(commit=False) as cursor:
-        cursor.execute("""
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_name = 'ses_emails'
-            ORDER BY ordinal_position;
-        """)
-        columns = {row["column_name"]: row["data_type"] for row in cursor.fetchall()}
+    columns = schema_snapshot["columns"]
 
     assert len(columns) == 14, f"Expected 14 columns, got {len(columns)}"
 
@@ -79,70 +108,45 @@ def test_ses_emails_table_columns(db):
         )
 
 
-def test_ses_emails_not_null_constraints(db):
+def test_ses_emails_not_null_constraints(schema_snapshot):
     """Test that required columns have NOT NULL constraints."""
     required_columns = ["id", "message_id", "s3_key", "sender", "intent_flags", "intent_label"]
 
-    with db.get_cursor(commit=False) as cursor:
-        cursor.execute("""
-            SELECT column_name, is_nullable
-            FROM information_schema.columns
-            WHERE table_name = 'ses_emails';
-        """)
-        columns = {row["column_name"]: row["is_nullable"] for row in cursor.fetchall()}
+    columns = schema_snapshot["nullable"]
 
     for col_name in required_columns:
         assert columns.get(col_name) == "NO", f"Column {col_name} should be NOT NULL"
 
 
-def test_ses_emails_indexes(db):
+def test_ses_emails_indexes(schema_snapshot):
     """Test that all required indexes exist."""
     expected_indexes = [
         "ses_emails_pkey",
         "ses_emails_message_id_key",
         "idx_ses_emails_message_id",
+        "idx_ses_emails_s3_key",
         "idx_ses_emails_sender",
         "idx_ses_emails_intent_label",
         "idx_ses_emails_status",
         "idx_ses_emails_processed_at",
     ]
 
-    with db.get_cursor(commit=False) as cursor:
-        cursor.execute("""
-            SELECT indexname
-            FROM pg_indexes
-            WHERE tablename = 'ses_emails';
-        """)
-        indexes = [row["indexname"] for row in cursor.fetchall()]
+    indexes = schema_snapshot["indexes"]
 
     for idx_name in expected_indexes:
         assert idx_name in indexes, f"Missing index: {idx_name}"
 
 
-def test_ses_emails_message_id_unique(db):
+def test_ses_emails_message_id_unique(schema_snapshot):
     """Test that message_id has a unique constraint."""
-    with db.get_cursor(commit=False) as cursor:
-        cursor.execute("""
-            SELECT constraint_name
-            FROM information_schema.table_constraints
-            WHERE table_name = 'ses_emails'
-            AND constraint_type = 'UNIQUE';
-        """)
-        constraints = [row["constraint_name"] for row in cursor.fetchall()]
+    constraints = [name for name, kind in schema_snapshot["constraints"].items() if kind == "UNIQUE"]
 
     assert "ses_emails_message_id_key" in constraints, "message_id unique constraint missing"
 
 
-def test_ses_emails_defaults(db):
+def test_ses_emails_defaults(schema_snapshot):
     """Test that default values are set correctly."""
-    with db.get_cursor(commit=False) as cursor:
-        cursor.execute("""
-            SELECT column_name, column_default
-            FROM information_schema.columns
-            WHERE table_name = 'ses_emails'
-            AND column_default IS NOT NULL;
-        """)
-        defaults = {row["column_name"]: row["column_default"] for row in cursor.fetchall()}
+    defaults = schema_snapshot["defaults"]
 
     assert "id" in defaults, "id should have a default (serial)"
     assert "nextval" in defaults["id"], "id should use a sequence"
@@ -0,0 +1,172 @@
+"""Tests for the batched processing pipeline in main.process_emails()."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from classifier import ClassificationResult, Classifier, Intent
+from db import Database
+from ses_client import Email, SESClient
+from workmail import WorkMailClient
+
+
+def make_email(n, subject, sender="user@example.com", message_id=None):
+    """Build a pending Email stored under emails/k<n>."""
+    return Email(
+        message_id=message_id or f"<m{n}@example.com>",
+        s3_key=f"emails/k{n}",
+        sender=sender,
+        sender_name="",
+        recipient="info@frflashy.com",
+        subject=subject,
+        body_text="Hello",
+        body_html="",
+        received_at=datetime(2025, 1, 4, 12, 0, 0),
+        raw_content=b"",
+    )
+
+
+def classification(intent):
+    """A ClassificationResult with only ``intent`` flagged."""
+    flags = [i == intent for i in Intent]
+    return ClassificationResult(intent=intent, intent_flags=flags, raw_response=str(flags))
+
+
+# Classifier replies for the test emails, keyed by subject
+INTENTS_BY_SUBJECT = {
+    "Pricing": Intent.SEND_INFO,
+    "Sign up": Intent.CREATE_ACCOUNT,
+}
+
+
+@pytest.fixture
+def pipeline():
+    """Stubbed service clients around a list of pending emails.
+
+    Set ``emails`` before calling ``run()``; the S3 listing and fetches
+    serve exactly those emails, and nothing is saved in the database.
+    """
+    ses = MagicMock(spec=SESClient)
+    db = MagicMock(spec=Database)
+    classifier = MagicMock(spec=Classifier)
+    workmail = MagicMock(spec=WorkMailClient)
+    state = SimpleNamespace(ses=ses, db=db, classifier=classifier, workmail=workmail, emails=[])
+
+    def fetch_emails(keys):
+        by_key = {email.s3_key: email for email in state.emails}
+        return [(key, by_key[key]) for key in keys]
+
+    ses.next_pending_batch.side_effect = lambda: [email.s3_key for email in state.emails]
+    ses.fetch_emails.side_effect = fetch_emails
+    ses.mark_processed_many.side_effect = len
+    db.s3_keys_existing.return_value = set()
+    db.email_exists_many.return_value = set()
+    db.save_email_many.side_effect = lambda records: list(range(len(records)))
+    classifier.classify_batch.side_effect = lambda items: [
+        classification(INTENTS_BY_SUBJECT[subject]) for subject, body, sender in items
+    ]
+
+    def run():
+        return main.process_emails(ses, classifier, db, workmail_client=workmail)
+
+    state.run = run
+    return state
+
+
+def saved_records(db):
+    """Records passed to save_email_many(), keyed by message ID."""
+    return {
+        record["message_id"]: record
+        for call in db.save_email_many.call_args_list
+        for record in call.args[0]
+    }
+
+
+def moved_keys(ses):
+    """S3 keys passed to mark_processed_many(), in call order."""
+    return [key for call in ses.mark_processed_many.call_args_list for key in call.args[0]]
+
+
+def test_process_emails_maps_classifications(pipeline):
+    """Test classify_batch results line up with their emails when some skip classification."""
+    pipeline.emails = [
+        make_email(0, "Pricing"),
+        make_email(1, "Out of Office: back Monday"),
+        make_email(2, "Sign up"),
+        make_email(3, "Delivery Status Notification (Failure)", sender="mailer-daemon@example.com"),
+    ]
+
+    assert pipeline.run() == 4
+
+    items = pipeline.classifier.classify_batch.call_args.args[0]
+    assert [subject for subject, body, sender in items] == ["Pricing", "Sign up"]
+
+    labels = {message_id: record["intent_label"] for message_id, record in saved_records(pipeline.db).items()}
+    assert labels == {
+        "<m0@example.com>": "send_info",
+        "<m1@example.com>": "spam_or_auto_reply",
+        "<m2@example.com>": "create_account",
+        "<m3@example.com>": "bounce_notification",
+    }
+    assert sorted(moved_keys(pipeline.ses)) == ["emails/k0", "emails/k1", "emails/k2", "emails/k3"]
+
+
+def test_process_emails_moves_already_saved_without_fetching(pipeline):
+    """Test pending keys already in the database are moved without a GET."""
+    pipeline.emails = [make_email(0, "Pricing"), make_email(1, "Sign up")]
+    pipeline.db.s3_keys_existing.return_value = {"emails/k0"}
+
+    assert pipeline.run() == 2
+
+    pipeline.ses.fetch_emails.assert_called_once_with(["emails/k1"])
+    assert pipeline.ses.mark_processed_many.call_args_list[0].args[0] == {"emails/k0"}
+    assert list(saved_records(pipeline.db)) == ["<m1@example.com>"]
+
+
+def test_process_emails_handles_duplicates_once(pipeline):
+    """Test copies of a Message-ID in one batch are classified and saved once."""
+    pipeline.emails = [
+        make_email(0, "Pricing", message_id="<dup@example.com>"),
+        make_email(1, "Pricing", message_id="<dup@example.com>"),
+    ]
+
+    assert pipeline.run() == 2
+
+    assert len(pipeline.classifier.classify_batch.call_args.args[0]) == 1
+    (record,) = saved_records(pipeline.db).values()
+    assert record["s3_key"] == "emails/k0"
+    assert sorted(moved_keys(pipeline.ses)) == ["emails/k0", "emails/k1"]
+
+
+def test_process_emails_save_failure(pipeline):
+    """Test a failed batched save falls back to per-email saves and moves only saved emails."""
+    pipeline.emails = [make_email(0, "Pricing"), make_email(1, "Sign up")]
+    pipeline.db.save_email_many.side_effect = None
+    pipeline.db.save_email_many.return_value = []
+    pipeline.db.save_email.side_effect = lambda **record: 1 if record["s3_key"] == "emails/k0" else None
+
+    pipeline.run()
+
+    assert pipeline.db.save_email.call_count == 2
+    assert moved_keys(pipeline.ses) == ["emails/k0"]
+    pipeline.ses.mark_failed.assert_called_once_with("emails/k1")
+
+
+def test_process_emails_batches_workmail_deletes(pipeline):
+    """Test handled auto-replies and notifications are deleted from WorkMail in one call."""
+    pipeline.emails = [
+        make_email(0, "Pricing"),
+        make_email(1, "Out of Office: back Monday"),
+        make_email(2, "Delivery Status Notification (Failure)", sender="mailer-daemon@example.com"),
+    ]
+
+    pipeline.run()
+
+    pipeline.workmail.delete_by_message_ids.assert_called_once()
+    assert sorted(pipeline.workmail.delete_by_message_ids.call_args.args[0]) == [
+        "<m1@example.com>", "<m2@example.com>",
+    ]
+    pipeline.workmail.delete_by_message_id.assert_not_called()
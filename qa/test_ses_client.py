@@ -1,15 +1,15 @@
 """Tests for SES client."""
 
-import os
-import sys
+import threading
 from datetime import datetime
+from email.message import Message
 from unittest.mock import MagicMock, patch
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from botocore.exceptions import ClientError
 
 from config import AWSConfig
-from ses_client import Email, SESClient
+from ses_client import BOTO_CLIENT_CONFIG, FETCH_CONCURRENCY, Email, SESClient
 
 
 def test_email_dataclass():
@@ -53,6 +53,27 @@ def test_email_body_fallback_to_html():
     assert "World" in email.body
     assert "<p>" not in email.body
 
+    # Stripped once, then cached
+    assert email.body is email.body
+
+
+def test_email_body_html_entities_and_styles():
+    """Test the HTML fallback decodes entities and drops style/script blocks."""
+    email = Email(
+        message_id="<test@example.com>",
+        s3_key="emails/test123",
+        sender="sender@example.com",
+        sender_name="",
+        recipient="recipient@frflashy.com",
+        subject="Test",
+        body_text="",
+        body_html="<style>p { color: red; }</style><p>Q&amp;A &nbsp;time</p><script>x()</script>",
+        received_at=datetime.now(),
+        raw_content=b"",
+    )
+
+    assert email.body == "Q&A time"
+
 
 def test_email_body_empty():
     """Test Email.body returns empty string when both are empty."""
@@ -91,7 +112,9 @@ def test_ses_client_init(mock_boto_client):
         region_name="us-east-1",
         aws_access_key_id="test_key",
         aws_secret_access_key="test_secret",
+        config=BOTO_CLIENT_CONFIG,
     )
+    assert BOTO_CLIENT_CONFIG.max_pool_connections >= FETCH_CONCURRENCY
 
 
 @patch("ses_client.boto3.client")
@@ -106,7 +129,6 @@ def test_list_pending_emails(mock_boto_client):
     mock_paginator.paginate.return_value = [
         {
             "Contents": [
-                {"Key": "emails/"},  # Should be skipped
                 {"Key": "emails/email1"},
                 {"Key": "emails/email2"},
             ]
@@ -124,6 +146,13 @@ def test_list_pending_emails(mock_boto_client):
     keys = list(client.list_pending_emails())
 
     assert keys == ["emails/email1", "emails/email2"]
+    # S3 leaves out the prefix placeholder itself
+    mock_paginator.paginate.assert_called_once_with(
+        Bucket="test-bucket",
+        Prefix="emails/",
+        StartAfter="emails/",
+        PaginationConfig={"PageSize": 1000},
+    )
 
 
 @patch("ses_client.boto3.client")
@@ -137,7 +166,6 @@ def test_count_pending_emails(mock_boto_client):
     mock_paginator.paginate.return_value = [
         {
             "Contents": [
-                {"Key": "emails/"},
                 {"Key": "emails/email1"},
                 {"Key": "emails/email2"},
                 {"Key": "emails/email3"},
@@ -158,6 +186,36 @@ def test_count_pending_emails(mock_boto_client):
     assert count == 3
 
 
+@patch("ses_client.boto3.client")
+def test_get_email_count_by_prefix(mock_boto_client):
+    """Test per-prefix counts, with a failed listing counted as zero."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    listings = {
+        "emails/": [{"Key": "emails/a"}, {"Key": "emails/b"}],
+        "processed/": [{"Key": "processed/c"}],
+    }
+
+    def paginate(Bucket, Prefix, StartAfter, PaginationConfig):
+        if Prefix not in listings:
+            raise ClientError({"Error": {"Code": "AccessDenied", "Message": "Denied"}}, "ListObjectsV2")
+        return [{"Contents": listings[Prefix]}]
+
+    mock_s3.get_paginator.return_value.paginate.side_effect = paginate
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+
+    assert client.get_email_count_by_prefix() == {"incoming": 2, "processed": 1, "failed": 0}
+
+
 @patch("ses_client.boto3.client")
 def test_mark_processed(mock_boto_client):
     """Test marking an email as processed."""
@@ -181,6 +239,40 @@ def test_mark_processed(mock_boto_client):
     )
 
 
+@patch("ses_client.boto3.client")
+def test_mark_processed_many(mock_boto_client):
+    """Test moving several emails: concurrent copies, then one bulk delete."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    def copy_object(Bucket, CopySource, Key):
+        if CopySource["Key"] == "emails/b":
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Missing"}}, "CopyObject")
+
+    mock_s3.copy_object.side_effect = copy_object
+    mock_s3.delete_objects.return_value = {"Errors": [{"Key": "emails/c", "Message": "Denied"}]}
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+    moved = client.mark_processed_many(["emails/a", "emails/b", "emails/c"])
+
+    # b failed to copy, so only a and c are deleted; c's delete then fails
+    assert moved == 1
+    assert mock_s3.copy_object.call_count == 3
+    mock_s3.delete_objects.assert_called_once_with(
+        Bucket="test-bucket",
+        Delete={"Objects": [{"Key": "emails/a"}, {"Key": "emails/c"}], "Quiet": True},
+    )
+    mock_s3.delete_object.assert_not_called()
+    assert client.mark_processed_many([]) == 0
+
+
 @patch("ses_client.boto3.client")
 def test_parse_simple_email(mock_boto_client):
     """Test parsing a simple email."""
@@ -198,7 +290,9 @@ Content-Type: text/plain; charset="utf-8"
 This is the email body.
 """
 
-    mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: raw_email)}
+    mock_s3.get_object.return_value = {
+        "Body": MagicMock(read=lambda: raw_email, iter_chunks=lambda chunk_size: iter([raw_email]))
+    }
 
     config = AWSConfig(
         access_key_id="test",
@@ -216,3 +310,239 @@ This is the email body.
     assert email.recipient == "recipient@frflashy.com"
     assert email.subject == "Test Subject"
     assert "email body" in email.body_text
+
+
+@patch("ses_client.boto3.client")
+def test_parse_multipart_email_skips_non_text_parts(mock_boto_client):
+    """Test multipart parsing keeps the first (nested) text body and decodes nothing else."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    raw_email = b"""From: sender@example.com
+Subject: Multipart
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="XX"
+
+--XX
+Content-Type: text/plain
+Content-Disposition: ATTACHMENT; filename="notes.txt"
+
+Attached notes.
+--XX
+Content-Type: image/png
+Content-Disposition: inline
+Content-Transfer-Encoding: base64
+
+iVBORw0KGgo=
+--XX
+Content-Type: multipart/alternative; boundary="YY"
+
+--YY
+Content-Type: text/plain; charset="utf-8"
+
+Plain body.
+--YY
+Content-Type: text/html; charset="utf-8"
+
+<p>HTML body.</p>
+--YY--
+--XX
+Content-Type: text/plain
+
+Forwarded plain part.
+--XX--
+"""
+    mock_s3.get_object.return_value = {"Body": MagicMock(iter_chunks=lambda chunk_size: iter([raw_email]))}
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+    with patch("email.message.Message.get_payload", autospec=True, side_effect=Message.get_payload) as get_payload:
+        email = client.fetch_email("emails/multipart")
+
+    # The HTML body is not needed (or decoded) when there is plain text
+    assert email.body_text.strip() == "Plain body."
+    assert email.body_html == ""
+    decoded = [call.args[0].get_content_type() for call in get_payload.call_args_list if call.kwargs.get("decode")]
+    assert decoded == ["text/plain"]
+
+
+@patch("ses_client.boto3.client")
+def test_parse_multipart_email_html_only(mock_boto_client):
+    """Test multipart parsing decodes the HTML part when there is no plain text body."""
+    raw_email = b"""From: sender@example.com
+Subject: HTML only
+MIME-Version: 1.0
+Content-Type: multipart/alternative; boundary="XX"
+
+--XX
+Content-Type: text/html; charset="utf-8"
+
+<p>HTML body.</p>
+--XX--
+"""
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    email = SESClient(config)._parse_email("emails/html-only", raw_email)
+
+    assert email.body_text == ""
+    assert email.body_html.strip() == "<p>HTML body.</p>"
+    assert email.body == "HTML body."
+
+    # An empty text part does not stand in for the HTML
+    raw_email = raw_email.replace(b"--XX\n", b"--XX\nContent-Type: text/plain\n\n\n--XX\n", 1)
+    email = SESClient(config)._parse_email("emails/empty-text", raw_email)
+
+    assert email.body_text == ""
+    assert email.body == "HTML body."
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", ""),
+    ("Plain subject", "Plain subject"),
+    ("=?utf-8?b?Q2Fmw6k=?=", "Café"),
+    ("Re: =?iso-8859-1?q?caf=E9?= menu", "Re: café menu"),
+])
+@patch("ses_client.boto3.client")
+def test_decode_header(mock_boto_client, header, expected):
+    """Test header decoding of plain and RFC 2047 encoded values."""
+    client = SESClient(AWSConfig(ses_bucket="test-bucket"))
+
+    assert client._decode_header(header) == expected
+
+
+@patch("ses_client.boto3.client")
+def test_fetch_emails_preserves_order(mock_boto_client):
+    """Test concurrent fetch_emails yields results in key order."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    def get_object(Bucket, Key):
+        raw = f"From: a@example.com\nSubject: {Key}\n\nbody\n".encode()
+        return {"Body": MagicMock(read=lambda: raw, iter_chunks=lambda chunk_size: iter([raw]))}
+
+    mock_s3.get_object.side_effect = get_object
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+    keys = [f"emails/email{i}" for i in range(25)]
+    results = list(client.fetch_emails(keys, max_workers=4))
+
+    assert [key for key, _ in results] == keys
+    assert [email.subject for _, email in results] == keys
+
+
+@patch("ses_client.boto3.client")
+def test_fetch_emails_overlaps_requests(mock_boto_client):
+    """Test fetch_emails keeps max_workers GetObject calls in flight at once."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    # Each GET waits until four are in flight; serial fetching would time out
+    barrier = threading.Barrier(4, timeout=5)
+
+    def get_object(Bucket, Key):
+        barrier.wait()
+        raw = f"From: a@example.com\nSubject: {Key}\n\nbody\n".encode()
+        return {"Body": MagicMock(iter_chunks=lambda chunk_size: iter([raw]))}
+
+    mock_s3.get_object.side_effect = get_object
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+    keys = [f"emails/email{i}" for i in range(8)]
+    results = list(client.fetch_emails(keys, max_workers=4))
+
+    assert all(email is not None for _, email in results)
+
+
+@patch("ses_client.boto3.client")
+def test_fetch_email_streams_chunks(mock_boto_client):
+    """Test fetch_email parses a body delivered in several chunks."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+
+    raw_email = (
+        b"From: sender@example.com\n"
+        b"Subject: Chunked\n"
+        b"Content-Type: text/plain; charset=\"utf-8\"\n"
+        b"\n" + b"x" * 1000 + b"\n"
+    )
+    chunks = [raw_email[i:i + 7] for i in range(0, len(raw_email), 7)]
+    mock_s3.get_object.return_value = {"Body": MagicMock(iter_chunks=lambda chunk_size: iter(chunks))}
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+    email = client.fetch_email("emails/chunked")
+
+    assert email.subject == "Chunked"
+    # Raw bytes are not kept, but can be fetched again on demand
+    assert email.raw_content is None
+    assert email.load_raw() == raw_email
+    assert mock_s3.get_object.call_count == 2
+    assert email.body_text == "x" * 1000 + "\n"
+
+
+@patch("ses_client.boto3.client")
+def test_next_pending_batch_resumes_listing(mock_boto_client):
+    """Test next_pending_batch continues from the previous page."""
+    mock_s3 = MagicMock()
+    mock_boto_client.return_value = mock_s3
+    mock_s3.list_objects_v2.side_effect = [
+        {
+            "Contents": [{"Key": "emails/email0"}, {"Key": "emails/email1"}],
+            "IsTruncated": True,
+            "NextContinuationToken": "token-1",
+        },
+        {
+            "Contents": [{"Key": "emails/email2"}],
+            "IsTruncated": False,
+        },
+    ]
+
+    config = AWSConfig(
+        access_key_id="test",
+        secret_access_key="test",
+        region="us-east-1",
+        ses_bucket="test-bucket",
+    )
+
+    client = SESClient(config)
+
+    assert client.next_pending_batch(batch_size=2) == ["emails/email0", "emails/email1"]
+    assert client.has_more_pending is True
+
+    assert client.next_pending_batch(batch_size=2) == ["emails/email2"]
+    assert client.has_more_pending is False
+
+    first_call, second_call = mock_s3.list_objects_v2.call_args_list
+    assert first_call.kwargs["StartAfter"] == "emails/"
+    assert second_call.kwargs["ContinuationToken"] == "token-1"
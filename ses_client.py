@@ -4,14 +4,22 @@ Handles fetching and parsing emails from the S3 bucket where SES stores them.
 """
 
 import email
+import functools
+import html
 import logging
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from email.header import decode_header
+from email.message import Message
+from email.parser import BytesFeedParser
 from email.utils import parseaddr, parsedate_to_datetime
-from typing import Iterator, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 
 from config import AWSConfig
@@ -23,10 +31,47 @@ INCOMING_PREFIX = "emails/"
 PROCESSED_PREFIX = "processed/"
 FAILED_PREFIX = "failed/"
 
+# Maximum keys taken from the incoming listing per processing cycle
+PENDING_BATCH_SIZE = 200
 
-@dataclass
+# Keys per ListObjectsV2 page when walking a whole prefix (the S3 maximum)
+LIST_PAGE_SIZE = 1000
+
+# Concurrent GetObject requests
+FETCH_CONCURRENCY = 16
+
+# Maximum keys per DeleteObjects request (the S3 limit)
+DELETE_BATCH_SIZE = 1000
+
+# Shared botocore settings: a connection pool large enough for the fetch
+# fan-out, TCP keep-alive to avoid reconnects, and adaptive retries
+BOTO_CLIENT_CONFIG = BotoConfig(
+    max_pool_connections=32,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=10,
+)
+
+# Chunk size for streaming S3 object bodies into the MIME parser
+READ_CHUNK_SIZE = 64 * 1024
+
+# Headers read by _parse_email (lowercase), collected in one pass over the message
+PARSED_HEADERS = frozenset({"message-id", "from", "to", "subject", "date"})
+
+# HTML-to-text fallback: drop script/style blocks, then tags, then collapse whitespace
+HTML_HIDDEN_RE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass(slots=True)
 class Email:
-    """Represents a parsed email message."""
+    """Represents a parsed email message.
+
+    Slotted: a batch of emails is held in memory at once, and slots drop
+    the per-instance __dict__.
+    """
 
     message_id: str
     s3_key: str
@@ -34,24 +79,49 @@ class Email:
     sender_name: str
     recipient: str
     subject: str
+    # First non-empty text/plain body of the message
     body_text: str
+    # First text/html body, only filled when there is no body_text: the
+    # parser does not decode HTML that body would not use
     body_html: str
     received_at: datetime
-    raw_content: bytes = field(repr=False)
+    # Raw message bytes; fetch_email() leaves this None and sets raw_loader,
+    # so only the emails that need the MIME source (bounces, complaints)
+    # ever hold it - see load_raw()
+    raw_content: Optional[bytes] = field(default=None, repr=False)
+    raw_loader: Optional[Callable[[], Optional[bytes]]] = field(default=None, repr=False, compare=False)
+    # Cached result of body (slots leave no __dict__ for cached_property)
+    _body: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def body(self) -> str:
-        """Return text body, falling back to stripped HTML."""
-        if self.body_text:
-            return self.body_text
-        if self.body_html:
-            # Basic HTML stripping (for classification purposes)
-            import re
-
-            text = re.sub(r"<[^>]+>", " ", self.body_html)
-            text = re.sub(r"\s+", " ", text)
-            return text.strip()
-        return ""
+        """Return text body, falling back to stripped HTML.
+
+        Computed on first access; the classifier, the database record and
+        the handlers each read it.
+        """
+        if self._body is None:
+            if self.body_text:
+                self._body = self.body_text
+            elif self.body_html:
+                # Basic HTML stripping (for classification purposes)
+                text = HTML_HIDDEN_RE.sub(" ", self.body_html)
+                text = HTML_TAG_RE.sub(" ", text)
+                text = WHITESPACE_RE.sub(" ", html.unescape(text))
+                self._body = text.strip()
+            else:
+                self._body = ""
+        return self._body
+
+    def load_raw(self) -> bytes:
+        """Return the raw message bytes, fetching them on first use.
+
+        Returns:
+            Raw email bytes, or b"" if they are unavailable.
+        """
+        if self.raw_content is None and self.raw_loader is not None:
+            self.raw_content = self.raw_loader() or b""
+        return self.raw_content or b""
 
 
 class SESClient:
@@ -66,12 +136,16 @@ class SESClient:
         self.bucket = config.ses_bucket
         self.region = config.region
 
+        # Position of next_pending_batch() in the incoming listing
+        self._continuation_token = None
+
         # Create S3 client
         self.s3 = boto3.client(
             "s3",
             region_name=config.region,
             aws_access_key_id=config.access_key_id,
             aws_secret_access_key=config.secret_access_key,
+            config=BOTO_CLIENT_CONFIG,
         )
 
     def list_pending_emails(self) -> Iterator[str]:
@@ -81,42 +155,134 @@ class SESClient:
             S3 object keys for unprocessed emails.
         """
         try:
-            paginator = self.s3.get_paginator("list_objects_v2")
-            pages = paginator.paginate(Bucket=self.bucket, Prefix=INCOMING_PREFIX)
-
-            for page in pages:
+            for page in self._paginate(INCOMING_PREFIX):
                 for obj in page.get("Contents", []):
-                    key = obj["Key"]
-                    # Skip the prefix itself
-                    if key != INCOMING_PREFIX:
-                        yield key
+                    yield obj["Key"]
         except ClientError as e:
             logger.error(f"Error listing emails: {e}")
             raise
 
+    @property
+    def has_more_pending(self) -> bool:
+        """Whether the last next_pending_batch() stopped before the listing ended."""
+        return self._continuation_token is not None
+
+    def next_pending_batch(self, batch_size: int = PENDING_BATCH_SIZE) -> list[str]:
+        """List the next batch of pending email keys.
+
+        Issues a single ListObjectsV2 request and remembers the continuation
+        token, so consecutive calls walk the incoming prefix page by page
+        instead of re-listing it from the start. After the last page the
+        next call starts over.
+
+        Args:
+            batch_size: Maximum number of keys to return.
+
+        Returns:
+            S3 object keys for unprocessed emails.
+        """
+        # StartAfter keeps the prefix placeholder object out of the listing
+        params = {
+            "Bucket": self.bucket,
+            "Prefix": INCOMING_PREFIX,
+            "StartAfter": INCOMING_PREFIX,
+            "MaxKeys": batch_size,
+        }
+        if self._continuation_token:
+            params["ContinuationToken"] = self._continuation_token
+
+        try:
+            response = self.s3.list_objects_v2(**params)
+        except ClientError as e:
+            # The token may have expired; restart the listing next time
+            self._continuation_token = None
+            logger.error(f"Error listing emails: {e}")
+            raise
+
+        self._continuation_token = response.get("NextContinuationToken") if response.get("IsTruncated") else None
+        return [obj["Key"] for obj in response.get("Contents", [])]
+
     def count_pending_emails(self) -> int:
         """Count pending emails without fetching them all.
 
         Returns:
             Number of pending emails.
         """
-        count = 0
         try:
-            paginator = self.s3.get_paginator("list_objects_v2")
-            pages = paginator.paginate(Bucket=self.bucket, Prefix=INCOMING_PREFIX)
-
-            for page in pages:
-                for obj in page.get("Contents", []):
-                    if obj["Key"] != INCOMING_PREFIX:
-                        count += 1
+            return self._count_prefix(INCOMING_PREFIX)
         except ClientError as e:
             logger.error(f"Error counting emails: {e}")
             raise
-        return count
+
+    def _paginate(self, prefix: str):
+        """Page through the objects under a prefix in full-size pages.
+
+        StartAfter=prefix leaves out the prefix placeholder object itself.
+
+        Args:
+            prefix: S3 key prefix.
+
+        Returns:
+            Iterable of ListObjectsV2 response pages.
+        """
+        paginator = self.s3.get_paginator("list_objects_v2")
+        return paginator.paginate(
+            Bucket=self.bucket,
+            Prefix=prefix,
+            StartAfter=prefix,
+            PaginationConfig={"PageSize": LIST_PAGE_SIZE},
+        )
+
+    def _count_prefix(self, prefix: str) -> int:
+        """Count the objects under a prefix, not counting the prefix itself.
+
+        Args:
+            prefix: S3 key prefix.
+
+        Returns:
+            Number of objects.
+
+        Raises:
+            ClientError: If a listing request fails.
+        """
+        return sum(len(page.get("Contents", [])) for page in self._paginate(prefix))
+
+    def fetch_emails(
+        self,
+        s3_keys: Iterable[str],
+        max_workers: int = FETCH_CONCURRENCY,
+    ) -> Iterator[tuple[str, Optional[Email]]]:
+        """Fetch and parse emails concurrently, preserving key order.
+
+        Up to ``max_workers`` GetObject requests run in parallel and at most
+        twice that many results are held ahead of the consumer, so S3 latency
+        is hidden behind whatever the caller does with each email.
+
+        Args:
+            s3_keys: S3 object keys to fetch.
+            max_workers: Maximum number of concurrent fetches.
+
+        Yields:
+            Tuples of (s3_key, Email or None if fetching/parsing failed).
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            in_flight = deque()
+            for s3_key in s3_keys:
+                in_flight.append((s3_key, pool.submit(self.fetch_email, s3_key)))
+                if len(in_flight) >= max_workers * 2:
+                    key, future = in_flight.popleft()
+                    yield key, future.result()
+            while in_flight:
+                key, future = in_flight.popleft()
+                yield key, future.result()
 
     def fetch_email(self, s3_key: str) -> Optional[Email]:
         """Fetch and parse an email from S3.
 
+        The object body is streamed into the MIME parser chunk by chunk
+        instead of being read in one piece and parsed afterwards. The raw
+        bytes are not kept; Email.load_raw() fetches them again if needed.
+
         Args:
             s3_key: The S3 object key.
 
@@ -125,9 +291,15 @@ class SESClient:
         """
         try:
             response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
-            raw_content = response["Body"].read()
 
-            return self._parse_email(s3_key, raw_content)
+            parser = BytesFeedParser()
+            for chunk in response["Body"].iter_chunks(READ_CHUNK_SIZE):
+                parser.feed(chunk)
+            msg = parser.close()
+
+            email = self._parse_email(s3_key, None, msg=msg)
+            email.raw_loader = functools.partial(self.fetch_raw, s3_key)
+            return email
         except ClientError as e:
             logger.error(f"Error fetching email {s3_key}: {e}")
             return None
@@ -135,35 +307,67 @@ class SESClient:
             logger.exception(f"Error parsing email {s3_key}: {e}")
             return None
 
-    def _parse_email(self, s3_key: str, raw_content: bytes) -> Email:
+    def fetch_raw(self, s3_key: str) -> Optional[bytes]:
+        """Fetch the raw bytes of an email from S3.
+
+        Args:
+            s3_key: The S3 object key.
+
+        Returns:
+            Raw email bytes, or None if the fetch fails.
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
+            return b"".join(response["Body"].iter_chunks(READ_CHUNK_SIZE))
+        except ClientError as e:
+            logger.error(f"Error fetching raw email {s3_key}: {e}")
+            return None
+
+    def _parse_email(
+        self,
+        s3_key: str,
+        raw_content: Optional[bytes],
+        msg: Optional[Message] = None,
+    ) -> Email:
         """Parse raw email content into an Email object.
 
         Args:
             s3_key: The S3 object key.
-            raw_content: Raw email bytes.
+            raw_content: Raw email bytes (may be None if msg is given).
+            msg: Already parsed message for raw_content (optional).
 
         Returns:
             Parsed Email object.
         """
-        msg = email.message_from_bytes(raw_content)
+        if msg is None:
+            msg = email.message_from_bytes(raw_content)
+
+        # One scan of the header list instead of a msg.get() scan per header;
+        # like msg.get(), the first occurrence of each header wins
+        headers = {}
+        fetch_parse = msg.policy.header_fetch_parse
+        for name, value in msg.raw_items():
+            key = name.lower()
+            if key in PARSED_HEADERS and key not in headers:
+                headers[key] = fetch_parse(name, value)
 
         # Extract message ID
-        message_id = msg.get("Message-ID", s3_key)
+        message_id = headers.get("message-id", s3_key)
 
         # Extract sender
-        from_header = msg.get("From", "")
+        from_header = headers.get("from", "")
         sender_name, sender_addr = parseaddr(from_header)
         sender_name = self._decode_header(sender_name) if sender_name else ""
 
         # Extract recipient
-        to_header = msg.get("To", "")
+        to_header = headers.get("to", "")
         _, recipient = parseaddr(to_header)
 
         # Extract subject
-        subject = self._decode_header(msg.get("Subject", ""))
+        subject = self._decode_header(headers.get("subject", ""))
 
         # Extract date
-        date_header = msg.get("Date")
+        date_header = headers.get("date")
         try:
             received_at = parsedate_to_datetime(date_header) if date_header else datetime.now()
         except Exception:
@@ -174,40 +378,52 @@ class SESClient:
         body_html = ""
 
         if msg.is_multipart():
-            for part in msg.walk():
+            # Depth-first over the parts in document order (like msg.walk(),
+            # without a generator per nesting level). Email.body only needs
+            # the HTML when there is no plain text, so the first text/html
+            # part is just remembered and decoded after the walk if needed.
+            html_part = None
+            stack = [msg]
+            while stack:
+                part = stack.pop()
+                if part.is_multipart():
+                    stack.extend(reversed(part.get_payload()))
+                    continue
+
                 content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", ""))
+
+                # Only text bodies are used; skip containers, images and other
+                # parts before decoding, so their payloads are never base64-decoded.
+                # The first text/plain and text/html parts are the message's own
+                # bodies; later ones belong to forwarded or attached messages.
+                if content_type == "text/html":
+                    if html_part is not None:
+                        continue
+                elif content_type != "text/plain":
+                    continue
 
                 # Skip attachments
-                if "attachment" in content_disposition:
+                content_disposition = part.get("Content-Disposition")
+                if content_disposition and "attachment" in str(content_disposition).lower():
                     continue
 
-                try:
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        charset = part.get_content_charset() or "utf-8"
-                        text = payload.decode(charset, errors="replace")
-
-                        if content_type == "text/plain":
-                            body_text = text
-                        elif content_type == "text/html":
-                            body_html = text
-                except Exception as e:
-                    logger.debug(f"Error decoding part: {e}")
+                if content_type == "text/html":
+                    html_part = part
+                    continue
+
+                body_text = self._decode_part(part)
+                if body_text:
+                    break
+
+            if not body_text and html_part is not None:
+                body_html = self._decode_part(html_part)
         else:
             # Single part message
-            try:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    charset = msg.get_content_charset() or "utf-8"
-                    text = payload.decode(charset, errors="replace")
-
-                    if msg.get_content_type() == "text/html":
-                        body_html = text
-                    else:
-                        body_text = text
-            except Exception as e:
-                logger.debug(f"Error decoding body: {e}")
+            text = self._decode_part(msg)
+            if msg.get_content_type() == "text/html":
+                body_html = text
+            else:
+                body_text = text
 
         return Email(
             message_id=message_id,
@@ -222,6 +438,24 @@ class SESClient:
             raw_content=raw_content,
         )
 
+    def _decode_part(self, part: Message) -> str:
+        """Decode the payload of a single (non-multipart) MIME part.
+
+        Args:
+            part: The message part.
+
+        Returns:
+            Decoded text, or "" if the part is empty or cannot be decoded.
+        """
+        try:
+            payload = part.get_payload(decode=True)
+            if payload:
+                charset = part.get_content_charset() or "utf-8"
+                return payload.decode(charset, errors="replace")
+        except Exception as e:
+            logger.debug(f"Error decoding part: {e}")
+        return ""
+
     def _decode_header(self, header_value: str) -> str:
         """Decode an email header value.
 
@@ -234,6 +468,10 @@ class SESClient:
         if not header_value:
             return ""
 
+        # Plain ASCII without RFC 2047 encoded words (the common case) is returned as is
+        if isinstance(header_value, str) and header_value.isascii() and "=?" not in header_value:
+            return header_value
+
         decoded_parts = []
         for part, encoding in decode_header(header_value):
             if isinstance(part, bytes):
@@ -253,6 +491,42 @@ class SESClient:
         """
         return self._move_email(s3_key, PROCESSED_PREFIX)
 
+    def mark_processed_many(self, s3_keys: Iterable[str], max_workers: int = FETCH_CONCURRENCY) -> int:
+        """Move several emails to the processed prefix concurrently.
+
+        Args:
+            s3_keys: S3 object keys to move.
+            max_workers: Maximum number of concurrent moves.
+
+        Returns:
+            Number of emails moved successfully.
+        """
+        s3_keys = list(s3_keys)
+        if not s3_keys:
+            return 0
+
+        # S3 has no batch copy, so copies run concurrently; the originals
+        # are then removed with DeleteObjects, up to 1000 keys per request
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(s3_keys))) as pool:
+            copied = [key for key, ok in zip(s3_keys, pool.map(self._copy_email, s3_keys)) if ok]
+
+        moved = 0
+        for start in range(0, len(copied), DELETE_BATCH_SIZE):
+            chunk = copied[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+                )
+            except ClientError as e:
+                logger.error(f"Error deleting {len(chunk)} moved email(s): {e}")
+                continue
+            errors = response.get("Errors", [])
+            for error in errors:
+                logger.error(f"Error deleting moved email {error.get('Key')}: {error.get('Message')}")
+            moved += len(chunk) - len(errors)
+        return moved
+
     def mark_failed(self, s3_key: str) -> bool:
         """Move an email to the failed prefix.
 
@@ -274,22 +548,38 @@ class SESClient:
         Returns:
             True if successful, False otherwise.
         """
+        if not self._copy_email(s3_key, dest_prefix):
+            return False
+
         try:
-            # Extract filename from key
-            filename = s3_key.split("/")[-1]
-            dest_key = f"{dest_prefix}{filename}"
+            # Delete original
+            self.s3.delete_object(Bucket=self.bucket, Key=s3_key)
+            return True
+        except ClientError as e:
+            logger.error(f"Error moving email {s3_key}: {e}")
+            return False
+
+    def _copy_email(self, s3_key: str, dest_prefix: str = PROCESSED_PREFIX) -> bool:
+        """Copy an email to a different prefix, keeping its filename.
 
-            # Copy to new location
+        Args:
+            s3_key: The source S3 object key.
+            dest_prefix: The destination prefix.
+
+        Returns:
+            True if successful, False otherwise.
+        """
+        # Extract filename from key
+        filename = s3_key.split("/")[-1]
+        dest_key = f"{dest_prefix}{filename}"
+
+        try:
             self.s3.copy_object(
                 Bucket=self.bucket,
                 CopySource={"Bucket": self.bucket, "Key": s3_key},
                 Key=dest_key,
             )
-
-            # Delete original
-            self.s3.delete_object(Bucket=self.bucket, Key=s3_key)
-
-            logger.debug(f"Moved {s3_key} to {dest_key}")
+            logger.debug(f"Copied {s3_key} to {dest_key}")
             return True
         except ClientError as e:
             logger.error(f"Error moving email {s3_key}: {e}")
@@ -315,25 +605,18 @@ class SESClient:
     def get_email_count_by_prefix(self) -> dict:
         """Get email counts for each prefix.
 
+        The three prefixes are listed concurrently.
+
         Returns:
             Dict with counts: {"incoming": N, "processed": N, "failed": N}
         """
-        counts = {"incoming": 0, "processed": 0, "failed": 0}
+        prefixes = {"incoming": INCOMING_PREFIX, "processed": PROCESSED_PREFIX, "failed": FAILED_PREFIX}
 
-        for prefix, key in [
-            (INCOMING_PREFIX, "incoming"),
-            (PROCESSED_PREFIX, "processed"),
-            (FAILED_PREFIX, "failed"),
-        ]:
+        def count(prefix):
             try:
-                paginator = self.s3.get_paginator("list_objects_v2")
-                pages = paginator.paginate(Bucket=self.bucket, Prefix=prefix)
-
-                for page in pages:
-                    for obj in page.get("Contents", []):
-                        if obj["Key"] != prefix:
-                            counts[key] += 1
+                return self._count_prefix(prefix)
             except ClientError:
-                pass
+                return 0
 
-        return counts
+        with ThreadPoolExecutor(max_workers=len(prefixes)) as pool:
+            return dict(zip(prefixes, pool.map(count, prefixes.values())))
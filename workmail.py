@@ -5,6 +5,7 @@ Handles marking processed emails as read in WorkMail.
 
 import imaplib
 import logging
+import ssl
 
 logger = logging.getLogger("ses-daemon-bot")
 
@@ -12,6 +13,12 @@ logger = logging.getLogger("ses-daemon-bot")
 WORKMAIL_SERVER = "imap.mail.us-east-1.awsapps.com"
 WORKMAIL_PORT = 993
 
+# Message-IDs combined into one OR'ed SEARCH command
+SEARCH_BATCH_SIZE = 50
+
+# TLS context shared by all connections (loading the CA bundle is not free)
+SSL_CONTEXT = ssl.create_default_context()
+
 
 class WorkMailClient:
     """Client for interacting with AWS WorkMail via IMAP."""
@@ -28,6 +35,8 @@ class WorkMailClient:
         self.password = password
         self.server = server or WORKMAIL_SERVER
         self._connection = None
+        # Mailbox currently selected on _connection
+        self._selected = None
 
     def connect(self) -> bool:
         """Connect to WorkMail IMAP server.
@@ -36,7 +45,8 @@ class WorkMailClient:
             True if connection successful, False otherwise
         """
         try:
-            self._connection = imaplib.IMAP4_SSL(self.server, WORKMAIL_PORT)
+            self._selected = None
+            self._connection = imaplib.IMAP4_SSL(self.server, WORKMAIL_PORT, ssl_context=SSL_CONTEXT)
             self._connection.login(self.email, self.password)
             logger.debug(f"Connected to WorkMail as {self.email}")
             return True
@@ -58,6 +68,31 @@ class WorkMailClient:
             except Exception:
                 pass
             self._connection = None
+            self._selected = None
+
+    def _select(self, mailbox: str) -> bool:
+        """Select a mailbox unless it is already selected.
+
+        The connection stays open between calls, so consecutive operations
+        on the same mailbox skip the SELECT round trip.
+
+        Args:
+            mailbox: Mailbox name
+
+        Returns:
+            True if the mailbox is selected, False otherwise
+        """
+        if self._selected == mailbox:
+            return True
+
+        status, _ = self._connection.select(mailbox)
+        if status != "OK":
+            logger.error(f"Failed to select mailbox {mailbox}")
+            self._selected = None
+            return False
+
+        self._selected = mailbox
+        return True
 
     def mark_as_read_by_message_id(self, message_id: str, mailbox: str = "INBOX", _retry: bool = True) -> bool:
         """Mark an email as read by its Message-ID header.
@@ -76,9 +111,7 @@ class WorkMailClient:
 
         try:
             # Select mailbox
-            status, _ = self._connection.select(mailbox)
-            if status != "OK":
-                logger.error(f"Failed to select mailbox {mailbox}")
+            if not self._select(mailbox):
                 return False
 
             # Search for the message by Message-ID
@@ -137,9 +170,7 @@ class WorkMailClient:
 
         try:
             # Select mailbox
-            status, _ = self._connection.select(mailbox)
-            if status != "OK":
-                logger.error(f"Failed to select mailbox {mailbox}")
+            if not self._select(mailbox):
                 return False
 
             # Search for the message by Message-ID
@@ -180,6 +211,79 @@ class WorkMailClient:
             logger.error(f"Error deleting email: {e}")
             return False
 
+    def delete_by_message_ids(self, message_ids: list[str], mailbox: str = "INBOX") -> int:
+        """Delete several emails with batched SEARCH, STORE and a single EXPUNGE.
+
+        Args:
+            message_ids: Message-ID header values
+            mailbox: Mailbox to search (default: INBOX)
+
+        Returns:
+            Number of messages deleted
+        """
+        return self._flag_by_message_ids(message_ids, "\\Deleted", mailbox, expunge=True)
+
+    def _flag_by_message_ids(
+        self, message_ids: list[str], flag: str, mailbox: str, expunge: bool = False, _retry: bool = True
+    ) -> int:
+        """Add a flag to all messages matching any of the given Message-IDs.
+
+        Args:
+            message_ids: Message-ID header values
+            flag: IMAP flag to add (e.g. \\Deleted)
+            mailbox: Mailbox to search
+            expunge: Expunge after storing the flag
+            _retry: Internal flag to prevent infinite retry loops
+
+        Returns:
+            Number of messages flagged
+        """
+        message_ids = [m for m in message_ids if m]
+        if not message_ids:
+            return 0
+
+        if not self._connection:
+            if not self.connect():
+                return 0
+
+        try:
+            if not self._select(mailbox):
+                return 0
+
+            # HEADER search is a substring match, so the bare ID matches
+            # with or without angle brackets
+            msg_nums = []
+            for i in range(0, len(message_ids), SEARCH_BATCH_SIZE):
+                chunk = message_ids[i:i + SEARCH_BATCH_SIZE]
+                terms = " ".join(f'HEADER Message-ID "{m.strip("<>")}"' for m in chunk)
+                criteria = "OR " * (len(chunk) - 1) + terms
+                status, messages = self._connection.search(None, criteria)
+                if status == "OK" and messages[0]:
+                    msg_nums.extend(messages[0].split())
+
+            if not msg_nums:
+                logger.debug(f"No messages found in WorkMail for {len(message_ids)} Message-ID(s)")
+                return 0
+
+            self._connection.store(b",".join(msg_nums).decode(), "+FLAGS", flag)
+            if expunge:
+                self._connection.expunge()
+            logger.debug(f"Flagged {len(msg_nums)} message(s) {flag} in WorkMail")
+
+            return len(msg_nums)
+
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+            # Connection was lost (inactivity timeout, network issue, etc.)
+            logger.debug(f"IMAP connection error, reconnecting: {e}")
+            self._connection = None
+            if _retry and self.connect():
+                return self._flag_by_message_ids(message_ids, flag, mailbox, expunge, _retry=False)
+            logger.error(f"Error flagging emails after reconnect: {e}")
+            return 0
+        except Exception as e:
+            logger.error(f"Error flagging emails: {e}")
+            return 0
+
     def __enter__(self):
         """Context manager entry."""
         self.connect()